@@ -1,11 +1,17 @@
 import streamlit as st
-import matplotlib.pyplot as plt
 import pandas as pd
-import urllib.parse
-import altair as alt
+import dashboard
 import data_manager
-import time
-import os
+import datastore
+import players
+import score_history
+import roulette
+import title_matcher
+import tracing
+import workout_stats
+import levels as lv
+import io
+import hashlib
 
 # --- ページ設定 ---
 st.set_page_config(
@@ -14,38 +20,153 @@ st.set_page_config(
     layout="centered"
 )
 
-st.title("👣 DDR Lv18 Manager")
-
-# --- データ読み込み関数 ---
-def load_csv(filename):
-    if os.path.exists(filename):
-        try:
-            return pd.read_csv(filename)
-        except Exception:
-            return None
-    return None
-
-# --- YouTubeリンク列を追加する関数 ---
-def add_youtube_link(df, col_name):
-    if df is None or df.empty or col_name not in df.columns:
-        return df
-    
-    def make_url(song_name):
-        query = urllib.parse.quote(f"DDR {song_name} 譜面確認")
-        return f"https://www.youtube.com/results?search_query={query}"
-
-    df['検索リンク'] = df[col_name].apply(make_url)
-    return df
-
-# データを読み込み
-df_wiki = load_csv("DDR18_songs.csv")      # ★全曲数用
-df_revenge = load_csv("lv18_revenge.csv")
-df_unplayed = load_csv("lv18_unplayed.csv")
-df_calories = load_csv("my_calorie_data.csv")
+# --- 表示レベルの選択（選んだレベルのファイルだけを読み込む） ---
+level = st.sidebar.selectbox(
+    "表示レベル", lv.WIKI_LEVELS, index=lv.WIKI_LEVELS.index(lv.DEFAULT_LEVEL),
+    format_func=lambda v: f"Lv{v}", key="level"
+)
 
-# リンク情報を付与
-df_revenge = add_youtube_link(df_revenge, "曲名")
-df_unplayed = add_youtube_link(df_unplayed, "未プレイ曲名")
+# --- プレイヤーの選択（URLの ?player=名前 でも選べる。Wikiの曲リストは全員で共有） ---
+def add_player():
+    try:
+        st.session_state["player"] = players.create_player(st.session_state.get("new_player"))
+        st.session_state["new_player"] = ""
+    except ValueError as e:
+        st.session_state["player_error"] = str(e)
+
+# URLで選べるのは登録済みのプレイヤーだけ（ページを開いただけでDBを作らない。追加は下のフォームから）
+player_options = players.list_players()
+if "player" not in st.session_state:
+    try:
+        requested = players.normalize_player(st.query_params.get("player"))
+        if requested not in player_options:
+            raise ValueError(f"登録されていないプレイヤーです: {requested}（「プレイヤーを追加」から追加してください）")
+        st.session_state["player"] = requested
+    except ValueError as e:
+        st.session_state["player_error"] = str(e)
+player = st.sidebar.selectbox("プレイヤー", player_options, key="player")
+st.query_params["player"] = player
+with st.sidebar.expander("プレイヤーを追加"):
+    st.text_input("名前（英数字と - _）", key="new_player")
+    st.button("追加", on_click=add_player, key="add_player")
+if "player_error" in st.session_state:
+    st.sidebar.error(st.session_state.pop("player_error"))
+
+st.title(f"👣 DDR Lv{level} Manager")
+if player != players.DEFAULT_PLAYER:
+    st.caption(f"プレイヤー: {player}")
+
+# 画面1回分の処理時間を記録する（サイドバーの「パフォーマンス」に表示。最後まで描けた回だけ残る）
+render_trace = tracing.start_run("app", level=level)
+
+# --- データ読み込み関数（キャッシュ付き） ---
+# キャッシュキーは (種類, レベル, プレイヤー, 更新番号)。スクレイパーや分析が書き込むと自動で読み直す
+# 更新番号は (共有DB, プレイヤーのDB) の組（players.revision）
+@st.cache_data(show_spinner=False, max_entries=32)
+def _query_cached(kind, level, player, revision, link_col=None):
+    df = players.load(kind, level, player)
+    return dashboard.add_youtube_link(df, link_col) if link_col else df
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _export_cached(kind, level, player, revision):
+    return players.export_csv(kind, level, player)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _progress_cached(level, player, revision):
+    return score_history.clear_rate_series(level, players.db_path(player), catalog_path=datastore.DB_FILE)
+
+# グラフは元データをキーにする（matplotlib / altair は dashboard の中で初めて読み込まれる）
+@st.cache_data(show_spinner=False, max_entries=16)
+def _pie_cached(cleared, playable):
+    return dashboard.clear_pie_png(cleared, playable)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _progress_chart_cached(level, player, revision):
+    return dashboard.progress_chart(_progress_cached(level, player, revision))
+
+# ワークアウトの集計はプレイヤーごとに1つ持ち続け、新しい日が増えたらその分だけ足す
+# （全セッションで共有するので、DBのデータだけを入れる。アップロードされたCSVはその場で集計する）
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _workout_stats(player):
+    return workout_stats.WorkoutStats()
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _workout_cached(player, df_calories, uploaded=False):
+    if uploaded:
+        stats = workout_stats.WorkoutStats(df_calories)
+    else:
+        # 以下の集計は今回渡したデータの版から出す（他のセッションが同時に更新しても混ざらない）
+        stats = _workout_stats(player).updated(df_calories)
+    summary = {
+        "totals": stats.totals(),
+        "recent": {window: stats.recent(window) for window in workout_stats.ROLLING_WINDOWS},
+        "monthly": stats.rollup("M").sort_values("期間", ascending=False),
+        "daily": stats.daily().sort_values("日付", ascending=False),
+    }
+    return summary, dashboard.workout_charts(stats)
+
+# アップロードされたCSVは中身のハッシュをキーにする（_data はハッシュ対象外）
+@st.cache_data(show_spinner=False, max_entries=16)
+def _read_upload_cached(digest, _data, link_col=None):
+    df = pd.read_csv(io.BytesIO(_data))
+    return dashboard.add_youtube_link(df, link_col) if link_col else df
+
+# 曲名のあいまい照合用の索引（公式の曲名が変わったときだけ作り直す）
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _matcher_cached(level, player, revision):
+    return title_matcher.TitleMatcher(datastore.load_scores(level, players.db_path(player))['曲名'])
+
+load_errors = []
+
+def load_table(kind, level=None, link_col=None):
+    try:
+        return _query_cached(kind, level, player, data_revision, link_col)
+    except Exception as e:
+        # 読めなかった表は None（画面は出すが、黙って空にはしない）
+        load_errors.append(f"{kind}: {e}")
+        return None
+
+# 処理時間の記録（画面表示のたびに書き足されるので、増えた行だけを読む）
+def last_trace(name):
+    return tracing.latest_run(name)
+
+TRACE_LABELS = {"app": "画面表示", "wiki": "Wiki更新", "official": "公式データ更新", "analyze": "分析"}
+
+def load_upload(uploaded, link_col=None):
+    data = uploaded.getvalue()
+    return _read_upload_cached(hashlib.sha1(data).hexdigest(), data, link_col)
+
+# --- ルーレット（抽選表はセッションに1つだけ持ち、曲リストや重み付けが変わったときだけ作り直す） ---
+WEIGHT_MODES = ["均等", "未プレイ優先", "最近の挑戦を優先"]
+
+def get_roulette(pool, level, mode):
+    titles = tuple(pool['曲名'])
+    key = (player, level, mode, hashlib.sha1("\n".join(titles).encode("utf-8")).hexdigest())
+    state = st.session_state.get("roulette")
+    if state is None or state[0] != key:
+        if mode == "未プレイ優先":
+            weights = [3.0 if unplayed else 1.0 for unplayed in pool['未プレイ']]
+        elif mode == "最近の挑戦を優先":
+            weights = score_history.recency_weights(level, titles, path=players.db_path(player))
+        else:
+            weights = None
+        state = (key, roulette.Roulette(range(len(pool)), weights))
+        st.session_state["roulette"] = state
+    return state[1]
+
+# データを読み込み（リンク情報も付与済み）
+# 更新番号と各表は同じ版から読む（更新中に読んでも、新しい曲リストと古いスコアのような食い違いが出ない）
+with tracing.span("load_data"), datastore.snapshot(datastore.DB_FILE, players.db_path(player)):
+    # このプレイヤーの表示に関わるDBの更新番号（この回の表示ではこれをキャッシュキーにする）
+    data_revision = players.revision(player)
+    df_wiki = load_table("charts", level)      # ★全曲数用
+    df_revenge = load_table("revenge", level, "曲名")
+    df_unplayed = load_table("unplayed", level, "未プレイ曲名")
+    df_calories = load_table("workouts")
+    df_progress = _progress_cached(level, player, data_revision)
+
+for error in load_errors:
+    st.warning(f"データの読み込みに失敗しました ({error})")
 
 
 # --- サイドバー ---
@@ -56,112 +177,134 @@ up_revenge = st.sidebar.file_uploader("リベンジリスト (revenge)", type=["
 up_unplayed = st.sidebar.file_uploader("未プレイリスト (unplayed)", type=["csv"], key="unp_uploader")
 up_calorie = st.sidebar.file_uploader("ワークアウト (calorie)", type=["csv"], key="cal_uploader")
 
-if up_revenge: 
-    df_revenge = pd.read_csv(up_revenge)
-    df_revenge = add_youtube_link(df_revenge, "曲名")
+if up_revenge:
+    df_revenge = load_upload(up_revenge, "曲名")
 
-if up_unplayed: 
-    df_unplayed = pd.read_csv(up_unplayed)
-    df_unplayed = add_youtube_link(df_unplayed, "未プレイ曲名")
+if up_unplayed:
+    df_unplayed = load_upload(up_unplayed, "未プレイ曲名")
 
 if up_calorie:
-    df_calories = pd.read_csv(up_calorie)
+    df_calories = load_upload(up_calorie)
+
+# CSVエクスポート（アップロードと同じ形式）
+with st.sidebar.expander("CSVエクスポート"):
+    for kind, label, filename in (
+        ("revenge", "リベンジリスト", f"lv{level}_revenge.csv"),
+        ("unplayed", "未プレイリスト", f"lv{level}_unplayed.csv"),
+        ("workouts", "ワークアウト", "my_calorie_data.csv"),
+    ):
+        st.download_button(label, _export_cached(kind, level, player, data_revision), file_name=filename,
+                           mime="text/csv", key=f"export_{kind}")
+
+# 更新するレベル（複数選ぶと並列で取得する）
+update_levels = st.sidebar.multiselect(
+    "更新するレベル", lv.WIKI_LEVELS, default=[level],
+    format_func=lambda v: f"Lv{v}", key="update_levels"
+)
+
+# 更新はバックグラウンドのジョブで実行する（実行中も画面は今のデータのまま操作できる）
+def start_job(kind):
+    job_id = data_manager.submit_job(kind, update_levels, player)
+    jobs = st.session_state.setdefault("jobs", [])
+    if job_id not in jobs:
+        jobs.append(job_id)
 
 # 1. Wiki更新ボタン
 if st.sidebar.button("1. Wikiリスト更新"):
-    with st.spinner("Wikiを確認中..."):
-        msg = data_manager.update_wiki_data()
-        if "成功" in msg:
-            st.success(msg)
-            time.sleep(1)
-            st.rerun() 
-        else:
-            st.error(msg)
+    start_job("wiki")
 
-# 2. 公式データ更新ボタン
+# 2. 公式データ更新ボタン（取得後に分析まで行う）
 if st.sidebar.button("2. 公式データ更新"):
-    st.info("ブラウザが起動します。初回のみ手動でログインしてください。")
-    with st.spinner("データ収集中... (ログイン状態を保存します)"):
-        # 1. データを集める
-        msg = data_manager.update_official_data()
-        
-        if "成功" in msg:
-            st.success(msg)
-            
-            # 2. 分析もする
-            res = data_manager.analyze_data()
-            st.info(res)
-            
-            # 3. キャッシュをクリアしてリロード
-            st.cache_data.clear()
-            st.balloons()
-            time.sleep(2)
+    st.sidebar.info("ブラウザが起動します。初回のみ手動でログインしてください。")
+    start_job("official")
+
+# ジョブの進み具合（実行中だけ1秒ごとに読み直す）
+@st.fragment(run_every=1.0 if data_manager.has_active_jobs() else None)
+def show_jobs():
+    reloaded = st.session_state.setdefault("jobs_reloaded", set())
+    for job_id in st.session_state.get("jobs", [])[-3:]:
+        job = data_manager.get_job(job_id)
+        if job is None:
+            continue
+        if job["active"]:
+            done = job["current"] / job["total"] if job["current"] is not None and job["total"] else 0.0
+            st.progress(min(done, 1.0), text=f"{job['label']}: {job['phase_label']} {job['detail']}")
+        elif job_id not in reloaded:
+            # 終わったジョブは1回だけ画面全体を読み直す（datastoreの更新番号が変わっていれば新しいデータになる）
+            reloaded.add(job_id)
             st.rerun()
+        elif job["ok"]:
+            st.success(f"{job['message']}")
         else:
-            st.error(msg)
+            st.error(job["message"])
+
+with st.sidebar:
+    show_jobs()
+
+# 直前の実行の工程ごとの処理時間（画面表示は1つ前に表示したときの分）
+with st.sidebar.expander("⏱ パフォーマンス"):
+    trace_name = st.selectbox("対象", list(TRACE_LABELS), format_func=TRACE_LABELS.get, key="trace_name")
+    trace = last_trace(trace_name)
+    if trace is None:
+        st.caption("まだ記録がありません")
+    else:
+        total, rows = tracing.breakdown(trace)
+        started = pd.Timestamp(trace["time"], unit="s", tz="UTC").tz_convert("Asia/Tokyo")
+        st.caption(f"{started:%Y/%m/%d %H:%M:%S} / 全体 {total:.2f}秒")
+        st.dataframe(
+            pd.DataFrame(rows, columns=["name", "seconds", "count", "share"]),
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "name": "工程",
+                "seconds": st.column_config.NumberColumn("秒", format="%.3f"),
+                "count": "回数",
+                "share": st.column_config.ProgressColumn("割合", min_value=0.0, max_value=1.0, format="percent"),
+            },
+        )
 
 
 # --- メインエリア：クリア率表示 ---
-if df_wiki is not None and not df_wiki.empty:
-    st.markdown("### 🏆 現在の攻略状況")
-    
-    total_songs = len(df_wiki) # 全曲数
+with tracing.span("dashboard"):
+    if df_wiki is not None and not df_wiki.empty:
+        st.markdown("### 🏆 現在の攻略状況")
     
-    # データがない場合は0として扱う
-    count_revenge = len(df_revenge) if df_revenge is not None else 0
-    count_unplayed = len(df_unplayed) if df_unplayed is not None else 0
+        # データがない場合は0として扱う
+        count_revenge = len(df_revenge) if df_revenge is not None else 0
+        count_unplayed = len(df_unplayed) if df_unplayed is not None else 0
+        stats = dashboard.clear_stats(len(df_wiki), count_revenge, count_unplayed)
+
+        # メトリクス表示
+        col1, col2, col3 = st.columns(3)
+        col1.metric(f"Lv{level} クリア率", f"{stats['clear_rate']:.1%}")
+        col2.metric("クリア済み", f"{stats['cleared']} / {stats['playable']} 曲")
+        col3.metric("未解禁含めたクリア率", f"{stats['all_clear_rate']:.1%}")
     
-    # クリア数 = 全曲 - (未クリア + 未プレイ)
-    cleared_count = total_songs - (count_revenge + count_unplayed)
+        st.progress(stats['clear_rate'])
+
+        #円グラフ（同じ件数なら描き直さない。まだ1曲もプレイしていなければ出さない）
+        if stats['playable'] > 0:
+            pie = _pie_cached(stats['cleared'], stats['playable'])
     
-    # 0除算防止
-    playable_total = total_songs - count_unplayed
-    if total_songs > 0 and playable_total > 0:
-        clear_rate = cleared_count / playable_total
-        all_clear_rate = cleared_count / total_songs
+            # Streamlitで表示
+            col1, col2, col3 = st.columns([1, 2, 1]) # 真ん中に表示するための工夫
+            with col2:
+                st.image(pie, use_container_width=True)
+
+        # クリア率の推移（クロール履歴から再構成）
+        if len(df_progress) >= 2:
+            st.markdown("#### 📈 クリア率の推移")
+            st.altair_chart(_progress_chart_cached(level, player, data_revision), use_container_width=True)
+
     else:
-        clear_rate = 0
-        all_clear_rate = 0
-        
-    # メトリクス表示
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Lv18 クリア率", f"{clear_rate:.1%}")
-    col2.metric("クリア済み", f"{cleared_count} / {total_songs-count_unplayed} 曲")
-    col3.metric("未解禁含めたクリア率", f"{all_clear_rate:.1%}")
-    
-    st.progress(clear_rate)
-
-    #円グラフ
-    # プロットするデータ
-    labels = 'clear','not clear'
-    sizes = [cleared_count,playable_total - cleared_count]
-    colors = ["#4672C4", '#FF5252'] 
-
-    fig, ax = plt.subplots(figsize=(4, 4)) # サイズ調整
-    # パイチャートを作成する
-    ax.pie(sizes, labels=labels, autopct='%1.1f%%', 
-           startangle=90, counterclock=False, 
-           colors=colors, wedgeprops={'edgecolor': 'white'})
-    
-    # 円をきれいな丸にする
-    ax.axis('equal') 
-    
-    # 背景を透明にする
-    fig.patch.set_alpha(0) 
-    
-    # Streamlitで表示
-    col1, col2, col3 = st.columns([1, 2, 1]) # 真ん中に表示するための工夫
-    with col2:
-        st.pyplot(fig)
-    
-else:
-    st.warning("Wikiデータ (DDR18_songs.csv) がありません。サイドバーから「Wikiリスト更新」を行ってください。")
+        st.warning(f"Lv{level} のWikiデータがありません。サイドバーから「Wikiリスト更新」を行ってください。")
 
 st.markdown("---")
 
 
 # --- タブエリア ---
-tab1, tab2, tab3 = st.tabs(["ルーレット", "未プレイリスト","ワークアウト"])
+# 選んでいるタブだけを描く（on_change="rerun" にすると tab.open が使える）
+tab1, tab2, tab3 = st.tabs(["ルーレット", "未プレイリスト","ワークアウト"], key="main_tab", on_change="rerun")
 
 column_config_settings = {
     "検索リンク": st.column_config.LinkColumn(
@@ -172,15 +315,26 @@ column_config_settings = {
 }
 
 # === タブ1：未クリア曲 ===
-with tab1:
-    st.header("めざせLv18制覇")
+with tab1, tracing.span("tab_roulette"):
+    st.header(f"めざせLv{level}制覇")
     
     if df_revenge is not None and not df_revenge.empty:
         count = len(df_revenge)
         st.info(f"現在のプレイ可能な未クリア残り: **{count}曲**")
         
+        col_mode, col_unplayed = st.columns(2)
+        weight_mode = col_mode.selectbox("重み付け", WEIGHT_MODES, key="roulette_mode")
+        include_unplayed = col_unplayed.checkbox("未プレイ曲も抽選に含める", key="roulette_unplayed")
+
+        pool = df_revenge[['曲名', '検索リンク']].assign(未プレイ=False)
+        if include_unplayed and df_unplayed is not None and not df_unplayed.empty:
+            extra = df_unplayed[['未プレイ曲名', '検索リンク']].rename(columns={'未プレイ曲名': '曲名'})
+            pool = pd.concat([pool, extra.assign(未プレイ=True)], ignore_index=True)
+        pool = pool.reset_index(drop=True)
+        wheel = get_roulette(pool, level, weight_mode)
+
         if st.button("抽選", type="primary", use_container_width=True):
-            target = df_revenge.sample(1).iloc[0]
+            target = pool.iloc[wheel.draw()]
             song_name = target['曲名']
             link = target['検索リンク']
             
@@ -188,7 +342,29 @@ with tab1:
             st.markdown(f"# 💿 {song_name}")
             st.markdown(f"[YouTubeで譜面を確認する]({link})")
             st.toast('抽選しました！', icon='🎉')
-            
+
+        st.caption(f"抽選{wheel.round}周目: まだ出ていない曲 {wheel.remaining} / {len(wheel)}曲")
+
+        with st.expander("セットリストを作る"):
+            target_kcal = st.number_input("目標消費カロリー (kcal)", min_value=0, max_value=5000, value=300, step=50)
+            try:
+                suggested = roulette.songs_for_calories(df_calories, target_kcal)
+            except Exception as e:
+                # アップロードされたCSVの形式が違っても、ルーレットは使えるようにする
+                suggested = 0
+                st.warning(f"ワークアウト実績から曲数を求められませんでした ({e})")
+            if suggested:
+                st.caption(f"ワークアウト実績から、目標までおよそ **{suggested}曲** です")
+            n_songs = st.number_input("曲数", min_value=1, max_value=len(wheel), value=min(max(suggested, 1), len(wheel)))
+            if st.button("セットリスト作成", use_container_width=True):
+                setlist = pool.iloc[wheel.draw_many(int(n_songs))]
+                st.dataframe(
+                    setlist[['曲名', '検索リンク']],
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config=column_config_settings
+                )
+
         with st.expander("未クリア一覧を見る"):
             st.dataframe(
                 df_revenge[['曲名', '検索リンク']], 
@@ -200,12 +376,12 @@ with tab1:
         st.success("リストが見つかりません (または全曲クリア済みです！)")
 
 # === タブ2：未プレイ曲 ===
-with tab2:
+with tab2, tracing.span("tab_unplayed"):
     st.header("未解禁譜面たち")
     
     if df_unplayed is not None and not df_unplayed.empty:
         count = len(df_unplayed)
-        st.write(f"まだ触ってないLv18が **{count}曲** あります。")
+        st.write(f"まだ触ってないLv{level}が **{count}曲** あります。")
         
         st.dataframe(
             df_unplayed[['未プレイ曲名', '検索リンク']], 
@@ -213,79 +389,86 @@ with tab2:
             hide_index=True,
             column_config=column_config_settings
         )
+
+        # Wikiと公式で曲名の表記が違う譜面は、ここで対応付けると次の分析から反映される
+        with st.expander("曲名の手動対応付け"):
+            matcher = _matcher_cached(level, player, data_revision)
+            if len(matcher):
+                chart = st.selectbox("Wikiの譜面名", df_unplayed['未プレイ曲名'], key="override_chart")
+                suggestions = matcher.candidates(chart, limit=1)
+                if suggestions:
+                    st.caption(f"候補: {suggestions[0][0]}（一致度 {suggestions[0][1]:.2f}）")
+                options = ["（対応なし）", *matcher.titles]
+                default = options.index(suggestions[0][0]) if suggestions else 0
+                official = st.selectbox("公式の曲名", options, index=default, key="override_official")
+                if "override_result" in st.session_state:
+                    ok, message = st.session_state.pop("override_result")
+                    (st.success if ok else st.error)(message)
+                if st.button("対応付けを保存して再分析", use_container_width=True):
+                    datastore.set_title_override(chart, None if official == options[0] else official)
+                    # 保存済みの分析結果（charts.status）は既定のプレイヤーの分だけ。
+                    # 他のプレイヤーの一覧は更新番号が変わったので、読み直すときに分類し直される
+                    if player == players.DEFAULT_PLAYER:
+                        # この回の表示は st.rerun() で打ち切るので先に記録を閉じ、分析は "analyze" として別に記録する
+                        tracing.finish_run(render_trace)
+                        res = data_manager.analyze_data(level)
+                        st.session_state["override_result"] = (res["ok"], res["message"])
+                    else:
+                        st.session_state["override_result"] = (True, f"対応付けを保存しました: {chart}")
+                    st.rerun()
+            else:
+                st.info("公式データがまだありません")
     else:
         st.success("未プレイ曲はありません！")
 
 
 # === タブ3：カロリーグラフ ===
-with tab3:
+with tab3, tracing.span("tab_workout"):
     st.header("ワークアウト")
     
-    if df_calories is not None and not df_calories.empty:
+    if df_calories is None or df_calories.empty:
+        st.info("カロリーデータがありません。")
+    elif tab3.open:
         try:
-            # データの前処理
-            df_calories["日付"] = pd.to_datetime(df_calories["日付"]).dt.date
-            df_calories["燃焼効率"] = df_calories["消費カロリー"] / df_calories["曲数"]
+            # データの前処理とグラフ（同じデータなら作り直さない）
+            summary, (daily_chart, analysis_chart) = _workout_cached(player, df_calories, bool(up_calorie))
+            totals = summary["totals"]
             
             col1, col2, col3 = st.columns(3)
             with col1:
-                total_cal = df_calories["消費カロリー"].sum()
-                st.metric("最新20日の総消費カロリー", f"{total_cal:,.0f} kcal")
+                st.metric(f"最新{totals['days']}日の総消費カロリー", f"{totals['total_kcal']:,.0f} kcal")
             with col2:
-                total_songs = df_calories["曲数"].sum()
-                st.metric("総プレイ曲数", f"{total_songs} 曲")
+                st.metric("総プレイ曲数", f"{totals['total_songs']} 曲")
             with col3:
-                avg_cal = df_calories["消費カロリー"].mean()
-                st.metric("1日平均", f"{avg_cal:,.0f} kcal")
+                st.metric("1日平均", f"{totals['avg_kcal']:,.0f} kcal")
+
+            # 直近の期間（最後の記録日まで）
+            for col, (window, recent) in zip(st.columns(len(summary["recent"])), summary["recent"].items()):
+                col.metric(f"直近{window}日", f"{recent['kcal']:,.0f} kcal", f"{recent['songs']} 曲 / {recent['days']} 日",
+                           delta_color="off")
 
             st.markdown("---")
 
             st.subheader("📅 日々の推移")
-            chart_df = df_calories.copy()
-            chart_df["日付"] = pd.to_datetime(chart_df["日付"])
-
-            max_cal = chart_df["消費カロリー"].max()
-            max_song = chart_df["曲数"].max()
-            scale_cal = alt.Scale(domain=[0, max_cal])
-            scale_song = alt.Scale(domain=[0, max_song * 1.3])
-
-            base = alt.Chart(chart_df).encode(
-                x=alt.X('日付:T', title='日付', axis=alt.Axis(format='%Y/%m/%d'))
-            )
-            bar = base.mark_bar(color='#FF4B4B', opacity=0.7).encode(
-                y=alt.Y('消費カロリー:Q', title='消費カロリー (kcal)', scale=scale_cal),
-                tooltip=[alt.Tooltip('日付:T', format='%Y/%m/%d'), '消費カロリー:Q', '曲数:Q']
-            )
-            line = base.mark_line(color='#2E86C1', point=True).encode(
-                y=alt.Y('曲数:Q', title='曲数 (曲)', scale=scale_song),
-                tooltip=['日付:T', '消費カロリー:Q', '曲数:Q']
-            )
-            combined_chart = alt.layer(bar, line).resolve_scale(y='independent')
-            st.altair_chart(combined_chart, use_container_width=True)
+            st.altair_chart(daily_chart, use_container_width=True)
 
             st.markdown("---")
 
             st.subheader("🔍 プレイ分析")
-            bubble = alt.Chart(chart_df).mark_circle().encode(
-                x=alt.X('曲数:Q', title='曲数 (曲)', scale=alt.Scale(zero=False)),
-                y=alt.Y('消費カロリー:Q', title='消費カロリー (kcal)', scale=alt.Scale(zero=False)),
-                size=alt.Size('消費カロリー:Q', legend=None, scale=alt.Scale(range=[100, 1000])),
-                color=alt.Color('燃焼効率:Q', title='効率', scale=alt.Scale(scheme='reds')),
-                tooltip=[alt.Tooltip('日付:T', format='%Y/%m/%d'), '曲数:Q', '消費カロリー:Q', '燃焼効率:Q']
-            )
-            trend = bubble.transform_regression('曲数', '消費カロリー').mark_line(
-                color='gray', strokeDash=[5,5]
-            )
-            st.altair_chart((bubble + trend).interactive(), use_container_width=True)
+            st.altair_chart(analysis_chart, use_container_width=True)
+
+            with st.expander("月ごとの集計"):
+                st.dataframe(summary["monthly"], use_container_width=True, hide_index=True,
+                             column_config={"期間": st.column_config.DateColumn("月", format="YYYY/MM")})
 
             with st.expander("詳細データを見る"):
-                st.dataframe(df_calories.sort_values("日付", ascending=False), use_container_width=True, hide_index=True)
+                st.dataframe(summary["daily"], use_container_width=True, hide_index=True)
                 
         except Exception as e:
             st.error(f"エラーが発生しました: {e}")
-    else:
-        st.info("カロリーデータがありません。")
 
 # --- フッター ---
 st.markdown("---")
-st.caption("DDR Lv18 Scorer | Created with Streamlit")
+st.caption(f"DDR Lv{level} Scorer | Created with Streamlit")
+
+tracing.finish_run(render_trace)
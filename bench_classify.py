@@ -0,0 +1,106 @@
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from extract_lv18_separate import classify_charts, create_fingerprint
+
+# 使い方: python bench_classify.py --charts 20000 --scores 20000 --legacy 2000
+
+KANA = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン"
+WORDS = ["Mix", "Remix", "Edit", "Long", "Train", "Heart", "Star", "Dance", "Night", "Fever"]
+STATUSES = ["クリア済み", "クリア済み", "未クリア(E)", "未プレイ", "データなし"]
+
+
+# --- ダミーデータ生成 ---
+def make_synthetic(n_charts, n_scores, seed=0):
+    rnd = random.Random(seed)
+    titles = []
+    seen = set()
+    while len(titles) < max(n_charts, n_scores):
+        t = "".join(rnd.choice(KANA) for _ in range(rnd.randint(3, 8)))
+        t += f" {rnd.choice(WORDS)} {rnd.randint(1, 9999)}"
+        if t not in seen:
+            seen.add(t)
+            titles.append(t)
+
+    suffixes = ["(鬼)", "(激)", ""]
+    df_wiki = pd.DataFrame({"曲名": [t + rnd.choice(suffixes) for t in titles[:n_charts]]})
+    df_my = pd.DataFrame({
+        "曲名": titles[:n_scores],
+        "EXPERT判定": [rnd.choice(STATUSES) for _ in range(n_scores)],
+        "CHALLENGE判定": [rnd.choice(STATUSES) for _ in range(n_scores)],
+    })
+    return df_wiki, df_my
+
+
+# --- 旧実装（iterrows + 全行スキャン）比較用 ---
+def classify_charts_legacy(df_wiki, df_my):
+    wiki_col = df_wiki.columns[0]
+    my_col = "曲名" if "曲名" in df_my.columns else df_my.columns[0]
+    df_my = df_my.copy()
+    df_my['fingerprint'] = df_my[my_col].apply(create_fingerprint)
+
+    revenge_list = []
+    unplayed_list = []
+    for index, row in df_wiki.iterrows():
+        raw_name = str(row[wiki_col]).strip()
+        search_key = create_fingerprint(raw_name)
+        target_mode = "BOTH"
+        if "(鬼)" in raw_name: target_mode = "CHALLENGE判定"
+        elif "(激)" in raw_name: target_mode = "EXPERT判定"
+
+        user_row = df_my[df_my['fingerprint'] == search_key]
+        status = "未プレイ"
+        if not user_row.empty:
+            if target_mode == "BOTH":
+                e = str(user_row.iloc[0].get("EXPERT判定", ""))
+                c = str(user_row.iloc[0].get("CHALLENGE判定", ""))
+                if "未クリア" in e or "未クリア" in c:
+                    status = "未クリア"
+                elif "クリア済み" in e and "クリア済み" in c:
+                    status = "クリア済み"
+            else:
+                val = user_row.iloc[0].get(target_mode, "")
+                if pd.notna(val):
+                    status = str(val)
+
+        if "未クリア" in status:
+            revenge_list.append(raw_name)
+        elif "クリア済み" in status:
+            continue
+        else:
+            unplayed_list.append(raw_name)
+    return revenge_list, unplayed_list
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分類処理の速度比較")
+    parser.add_argument("--charts", type=int, default=20000)
+    parser.add_argument("--scores", type=int, default=20000)
+    parser.add_argument("--legacy", type=int, default=2000, help="旧実装で比較する件数 (0で省略)")
+    args = parser.parse_args()
+
+    df_wiki, df_my = make_synthetic(args.charts, args.scores)
+    (revenge, unplayed), elapsed = _timed(classify_charts, df_wiki, df_my)
+    print(f"新実装: {args.charts}譜面 x {args.scores}行 -> {elapsed:.3f}秒 "
+          f"(リベンジ {len(revenge)} / 未プレイ {len(unplayed)})")
+
+    if args.legacy:
+        small_wiki, small_my = make_synthetic(args.legacy, args.legacy)
+        new_result, new_time = _timed(classify_charts, small_wiki, small_my)
+        old_result, old_time = _timed(classify_charts_legacy, small_wiki, small_my)
+        same = "一致" if new_result == old_result else "不一致"
+        print(f"旧実装比較: {args.legacy}譜面 x {args.legacy}行 -> "
+              f"旧 {old_time:.3f}秒 / 新 {new_time:.3f}秒 ({old_time / new_time:.0f}倍, 結果{same})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import glob
+import time
+
+import html_parser
+import page_fixtures
+
+# 使い方: python bench_parse.py "saved_pages/*.html" --repeat 5
+#         python bench_parse.py --fixture lv18   (スクレイパーの --record で記録したページで計測)
+#         (ページを指定しなければダミーページで計測)
+
+PARSERS = {
+    "score": html_parser.parse_score_rows,
+    "workout": html_parser.parse_workout_rows,
+    "wiki": html_parser.parse_wiki_songs,
+}
+
+
+# --- 保存済みページの種類を判定 ---
+def detect_kind(html):
+    if "work_out_left" in html:
+        return "workout"
+    if "wikibody" in html:
+        return "wiki"
+    if "music_tit" in html or 'class="data"' in html:
+        return "score"
+    return None
+
+
+# --- ダミーページ（本物に近いよう、表の外にもそれなりのマークアップを置く） ---
+def _noise(n):
+    return "".join(f'<div class="nav"><ul><li><a href="/p/{i}">メニュー{i}</a></li></ul></div>' for i in range(n))
+
+
+def make_score_page(n_rows=50):
+    rows = "".join(
+        f'<tr class="data"><td><a href="/m/{i}"><div class="music_tit">曲名{i} (Mix)</div></a></td>'
+        f'<td id="expert"><img src="/img/rank_s_{"e" if i % 4 == 0 else "aa"}.png"></td>'
+        f'<td id="challenge">{"" if i % 3 == 0 else "<img src=/img/rank_s_a.png>"}</td></tr>'
+        for i in range(n_rows)
+    )
+    return f"<html><body>{_noise(200)}<table>{rows}</table>{_noise(100)}</body></html>"
+
+
+def make_workout_page(n_days=20):
+    rows = "".join(
+        f"<tr><td>{i}</td><td>2026-01-{i % 28 + 1:02d}</td><td>{10 + i} 曲</td><td>{300 + i * 7.5} kcal</td><td>-</td></tr>"
+        for i in range(n_days)
+    )
+    return f'<html><body>{_noise(200)}<table id="work_out_left"><tr><th>No</th></tr>{rows}</table></body></html>'
+
+
+def make_wiki_page(n_rows=300):
+    rows = "".join(f'<tr><td><a href="/s/{i}">曲名{i}(鬼)</a></td><td>18</td></tr>' for i in range(n_rows))
+    return f'<html><body>{_noise(300)}<div id="wikibody"><table><tr><th>曲名</th></tr>{rows}</table></div></body></html>'
+
+
+def load_corpus(patterns, fixtures=()):
+    corpus = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                html = f.read()
+            kind = detect_kind(html)
+            if kind:
+                corpus.append((kind, html))
+    for name in fixtures:
+        fixture = page_fixtures.Fixture(name)
+        for url in fixture.urls():
+            html = fixture.get(url).decode("utf-8", errors="replace")
+            kind = detect_kind(html)
+            if kind:
+                corpus.append((kind, html))
+    if not corpus:
+        corpus = [("score", make_score_page()) for _ in range(10)]
+        corpus += [("workout", make_workout_page()), ("wiki", make_wiki_page())]
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTMLパーサーの速度比較")
+    parser.add_argument("patterns", nargs="*", help="保存済みHTMLのパス（globパターン可）")
+    parser.add_argument("--fixture", action="append", default=[], help="page_fixtures の記録（名前かパス。複数可）")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.patterns, args.fixture)
+    print(f"ページ数: {len(corpus)} / パーサー: {', '.join(html_parser.BACKENDS)}")
+
+    for kind, func in PARSERS.items():
+        pages = [html for k, html in corpus if k == kind]
+        if not pages:
+            continue
+        results = {}
+        for backend in html_parser.BACKENDS:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                parsed = [func(html, backend=backend) for html in pages]
+            elapsed = time.perf_counter() - start
+            n_rows = sum(len(rows or []) for rows in parsed) * args.repeat
+            results[backend] = parsed
+            print(f"  {kind:8s} {backend:5s}: {n_rows / elapsed:10,.0f} 行/秒 ({elapsed / (len(pages) * args.repeat) * 1000:.2f} ms/ページ)")
+        if len(results) > 1:
+            same = "一致" if all(r == results["bs4"] for r in results.values()) else "不一致"
+            print(f"  {kind:8s} 結果: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import dashboard
+import datastore
+import workout_stats
+from extract_lv18_separate import classify_charts
+
+# 使い方: python bench_suite.py                              (100〜100万行で全項目を計測。100万行は数分かかる)
+#         python bench_suite.py --sizes 100 10000 --out after.json --compare before.json
+#         (--compare で前回の結果と比べ、遅くなった項目に印を付ける)
+
+SIZES = (100, 1_000, 10_000, 100_000, 1_000_000)
+BENCH_LEVEL = 1          # 一時DBの中で使うレベル（実データのあるレベルと重ならないように）
+SLOWER_THRESHOLD = 1.2   # これ以上遅くなったら「遅化」として表示
+MAX_WORKOUT_DAYS = 100_000   # ワークアウトは1日1行なので、日付が作れる範囲（約270年分）で打ち切る
+
+# --- ダミーデータの素材（実際の曲名に近い文字種の混ざり方にする） ---
+KANJI = ["月光", "乱舞", "最速", "最高", "灼熱", "嘆き", "樹", "海神", "冥", "鳳", "逆月", "量子", "夢", "東方", "迷宮", "勇猛", "無比", "炎龍"]
+KANA = ["シャッター", "ガール", "ロンド", "リントヴルム", "ミカヅキ", "コネクト", "そふらん", "ちゃん", "トキオ", "バンブー", "ソード", "アナーキー"]
+ENGLISH = ["Dragon", "Blade", "Heaven", "Paranoia", "Evolution", "Trigger", "Valkyrie", "Dimension", "Nocturnal", "Days",
+           "Come", "To", "Life", "MAX", "Over", "The", "Period", "Glitch", "Angel", "Neutrino", "Meteor", "Sense"]
+DECORATIONS = ["", "", "", " (X-Special)", " (20th Anniversary Mix)", " ～eternal love mix～", "♥", "!!", " -TAG EDITION-"]
+SUFFIXES = ["(鬼)", "(激)", ""]
+STATUSES = ["クリア済み", "クリア済み", "クリア済み", "未クリア", "未プレイ"]
+
+
+# ==========================================
+# ダミーデータ生成
+# ==========================================
+def make_title(rnd):
+    parts = []
+    for _ in range(rnd.randint(1, 3)):
+        kind = rnd.random()
+        if kind < 0.3:
+            parts.append(rnd.choice(KANJI))
+        elif kind < 0.5:
+            parts.append(rnd.choice(KANA))
+        else:
+            parts.append(rnd.choice(ENGLISH))
+    sep = "" if rnd.random() < 0.3 else " "
+    return sep.join(parts) + rnd.choice(DECORATIONS)
+
+
+def make_catalog(n, seed=0):
+    """n譜面分のWiki曲リストと、公式スコア（9割の曲を含む）を作る"""
+    rnd = random.Random(seed)
+    titles = []
+    seen = set()
+    while len(titles) < n:
+        title = make_title(rnd)
+        if title in seen:
+            title = f"{title} {len(titles)}"
+        seen.add(title)
+        titles.append(title)
+
+    df_wiki = pd.DataFrame({"曲名": [t + rnd.choice(SUFFIXES) for t in titles]})
+    played = [t for t in titles if rnd.random() < 0.9]
+    df_my = pd.DataFrame({
+        "曲名": played,
+        "EXPERT判定": [rnd.choice(STATUSES) for _ in played],
+        "CHALLENGE判定": [rnd.choice(STATUSES) for _ in played],
+    })
+    return df_wiki, df_my
+
+
+def make_workouts(n_days, seed=0):
+    """直近 n_days 日分のワークアウト（1日1行）"""
+    rnd = random.Random(seed)
+    start = date.today() - timedelta(days=n_days - 1)
+    songs = [rnd.randint(3, 40) for _ in range(n_days)]
+    return pd.DataFrame({
+        "日付": [(start + timedelta(days=i)).isoformat() for i in range(n_days)],
+        "曲数": songs,
+        "消費カロリー": [round(s * rnd.uniform(25, 45), 3) for s in songs],
+    })
+
+
+# ==========================================
+# 計測
+# ==========================================
+def _best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_size(n, repeat, db_path):
+    """{項目: (秒, 行数)} を返す"""
+    df_wiki, df_my = make_catalog(n)
+    df_calories = make_workouts(min(n, MAX_WORKOUT_DAYS))
+    rows = [(t, e, c) for t, e, c in df_my.itertuples(index=False)]
+    results = {}
+
+    # 解析: Wikiの曲リストと公式スコアの照合
+    results["classify"] = _best_of(lambda: classify_charts(df_wiki, df_my), repeat)
+    revenge, unplayed = classify_charts(df_wiki, df_my)
+
+    # 保存: datastore への書き込み（スクレイパーの保存処理と同じ経路）
+    def write():
+        datastore.replace_charts(BENCH_LEVEL, df_wiki["曲名"], path=db_path)
+        datastore.upsert_scores(BENCH_LEVEL, rows, path=db_path)
+        datastore.set_chart_status(BENCH_LEVEL, revenge, unplayed, path=db_path)
+    results["datastore_write"] = _best_of(write, 1)
+
+    # 読み込み: datastore から一覧を読み、YouTubeリンクを付ける（app.py の読み込みと同じ経路）
+    results["load_revenge"] = _best_of(lambda: datastore.load_revenge(BENCH_LEVEL, db_path), repeat)
+    results["load_scores"] = _best_of(lambda: datastore.load_scores(BENCH_LEVEL, db_path), repeat)
+    df_revenge = datastore.load_revenge(BENCH_LEVEL, db_path)
+    results["add_youtube_link"] = _best_of(lambda: dashboard.add_youtube_link(df_revenge.copy(), "曲名"), repeat)
+
+    # 画面: ダッシュボードの数値と円グラフ
+    stats = dashboard.clear_stats(len(df_wiki), len(revenge), len(unplayed))
+    results["dashboard_metrics"] = _best_of(
+        lambda: dashboard.clear_stats(len(df_wiki), len(revenge), len(unplayed)), repeat
+    )
+    results["render_pie"] = _best_of(lambda: dashboard.clear_pie_png(stats["cleared"], stats["playable"]), repeat)
+
+    # ワークアウト: 全期間の集計と、1日増えたときの更新（n日分。MAX_WORKOUT_DAYS まで）
+    results["workout_stats"] = _best_of(lambda: workout_stats.WorkoutStats(df_calories).totals(), repeat)
+    stats_before = workout_stats.WorkoutStats(df_calories.iloc[:-1])
+    results["workout_update"] = _best_of(lambda: stats_before.update(df_calories), repeat)
+    full = workout_stats.WorkoutStats(df_calories)
+    results["workout_rollup"] = _best_of(lambda: (full.rolling(7), full.rollup("M"), full.regression()), repeat)
+
+    days = len(df_calories)
+    return {case: (seconds, days if case.startswith("workout") else n) for case, seconds in results.items()}
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def compare(results, previous):
+    """前回の結果と比べて (項目, 行数, 前回, 今回, 倍率) のリストを返す"""
+    before = {(r["case"], r["size"]): r["seconds"] for r in previous.get("results", [])}
+    rows = []
+    for r in results:
+        old = before.get((r["case"], r["size"]))
+        if old:
+            rows.append((r["case"], r["size"], old, r["seconds"], r["seconds"] / old))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="読み込み・解析・描画の速度計測（ダミーデータ）")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=3, help="各項目を何回計って最速を採るか")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="比較する前回の結果JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            # サイズごとに新しいDBにする（前のサイズの行が残らないように）
+            db_path = os.path.join(tmp, f"bench_{n}.sqlite3")
+            print(f"--- {n:,}行 ---")
+            for case, (seconds, rows) in run_size(n, args.repeat, db_path).items():
+                note = f" ({rows:,}行)" if rows != n else ""
+                print(f"  {case:<18} {seconds:9.4f}秒{note}")
+                results.append({"case": case, "size": n, "rows": rows, "seconds": seconds})
+
+    report = {"environment": environment(), "repeat": args.repeat, "results": results}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果を保存しました: {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        print(f"\n前回 ({previous.get('environment', {}).get('commit')}) との比較:")
+        for case, n, old, new, ratio in compare(results, previous):
+            mark = "  <- 遅化" if ratio >= SLOWER_THRESHOLD else ""
+            print(f"  {case:<18} {n:>9,}行  {old:9.4f} -> {new:9.4f}秒 ({ratio:.2f}倍){mark}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from urllib3.util.retry import Retry
+
+# ==========================================
+# 設定エリア
+# ==========================================
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+BROWSER_DIR = os.path.join(base_dir, ".browser")           # プロフィール・キャッシュの置き場
+DRIVER_CACHE_FILE = os.path.join(BROWSER_DIR, "driver.json")
+SESSION_FILE = os.path.join(BROWSER_DIR, "session.json")
+
+DRIVER_CACHE_DAYS = 7   # この日数はChromeDriverのバージョン確認（ネット接続）を省略する
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+# ==========================================
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+# --- ChromeDriverのパス（キャッシュ付き） ---
+def get_driver_path():
+    cache = _read_json(DRIVER_CACHE_FILE)
+    path = cache.get("path")
+    fresh = time.time() - cache.get("checked", 0) < DRIVER_CACHE_DAYS * 86400
+    if path and fresh and os.path.exists(path):
+        return path
+
+    # 期限切れ・未取得のときだけ webdriver-manager で確認する
+    from webdriver_manager.chrome import ChromeDriverManager
+    path = ChromeDriverManager().install()
+    _write_json(DRIVER_CACHE_FILE, {"path": path, "checked": time.time()})
+    return path
+
+
+# --- ログイン状態の記録 ---
+def profile_dir(name):
+    # 同時に起動できるよう、スクレイパーごとに別のプロフィールを使う
+    return os.path.join(BROWSER_DIR, f"profile-{name}")
+
+
+def has_valid_session(name):
+    return bool(_read_json(SESSION_FILE).get(name, {}).get("valid"))
+
+
+def mark_session(name, valid):
+    sessions = _read_json(SESSION_FILE)
+    sessions[name] = {"valid": bool(valid), "checked": time.time()}
+    _write_json(SESSION_FILE, sessions)
+
+
+# --- ブラウザ起動 ---
+def create_driver(name, headless=None, stealth=False):
+    """保存済みプロフィールでChromeを起動する。
+    headless を省略すると、前回ログインに成功していれば画面なしで起動する"""
+    if headless is None:
+        headless = has_valid_session(name)
+
+    options = webdriver.ChromeOptions()
+    options.add_argument(f"--user-data-dir={profile_dir(name)}")
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1280,2000")
+    if stealth:
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_experimental_option('useAutomationExtension', False)
+        options.add_argument('--disable-blink-features=AutomationControlled')
+        options.add_argument(f"user-agent={USER_AGENT}")
+
+    return webdriver.Chrome(service=Service(get_driver_path()), options=options)
+
+
+# --- 要素が出るまで待つ（固定sleepの代わり） ---
+def wait_for(driver, css_selector, timeout=10):
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, css_selector))
+        )
+        return True
+    except TimeoutException:
+        return False
+
+
+# --- ログイン済みブラウザのCookieをHTTPセッションに引き継ぐ ---
+def create_http_session(driver=None, pool_size=4):
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+
+    if driver is not None:
+        for cookie in driver.get_cookies():
+            session.cookies.set(cookie["name"], cookie["value"],
+                                domain=cookie.get("domain"), path=cookie.get("path", "/"))
+    return session
+
+
+class RateLimiter:
+    """複数スレッドから呼ばれても、リクエスト開始が interval 秒以上空くようにする"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+# ==========================================
+# ページ単位のクロール途中経過（中断しても、取れたページから再開できるようにする）
+# ==========================================
+# ディレクトリの中身:
+#   manifest.json        … 開始日時
+#   page-0000.json       … {"offset", "rows", "hash", "fetched_at"}（1ページ1ファイル。一時ファイルに書いてから置き換える）
+# 全ページ取れて保存し終わったら clear() で消す。古すぎる途中経過は使わずに捨てる
+MAX_AGE = 6 * 3600   # これより前に始めたクロールの途中経過は再開に使わない（秒）
+# ==========================================
+
+
+def page_hash(rows):
+    return hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class CrawlCheckpoint:
+    """1つのクロール（例: あるプレイヤーのLv18のスコア一覧）の途中経過"""
+
+    def __init__(self, directory, max_age=MAX_AGE):
+        self.directory = directory
+        self.max_age = max_age
+        self._pages = {}
+        self._load()
+
+    def _page_file(self, offset):
+        return os.path.join(self.directory, f"page-{offset:04d}.json")
+
+    def _load(self):
+        manifest = os.path.join(self.directory, "manifest.json")
+        try:
+            with open(manifest, encoding="utf-8") as f:
+                started = json.load(f)["started"]
+        except (OSError, ValueError, KeyError):
+            started = None
+        if started is None or time.time() - started > self.max_age:
+            # 途中経過が無いか古い：最初から取り直す
+            self.clear()
+            os.makedirs(self.directory, exist_ok=True)
+            _write_json(manifest, {"started": time.time()})
+            return
+
+        for name in os.listdir(self.directory):
+            if not (name.startswith("page-") and name.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    page = json.load(f)
+            except (OSError, ValueError):
+                continue
+            # 書きかけ・壊れたページは無かったことにする（取り直す）
+            if page.get("hash") == page_hash(page.get("rows")):
+                self._pages[page["offset"]] = page["rows"]
+
+    def __contains__(self, offset):
+        return offset in self._pages
+
+    def __len__(self):
+        return len(self._pages)
+
+    def get(self, offset):
+        return self._pages.get(offset)
+
+    def put(self, offset, rows):
+        """取れたページをすぐにディスクへ書く（行が無いページ＝最終ページの次も記録する）"""
+        rows = [list(row) for row in rows]
+        _write_json(self._page_file(offset), {
+            "offset": offset, "rows": rows, "hash": page_hash(rows), "fetched_at": time.time(),
+        })
+        self._pages[offset] = rows
+
+    def clear(self):
+        self._pages = {}
+        shutil.rmtree(self.directory, ignore_errors=True)
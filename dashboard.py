@@ -0,0 +1,123 @@
+import io
+import urllib.parse
+
+import workout_stats
+
+# app.py の画面に出す数値・グラフの計算（Streamlitに依存しないので、ベンチマークからも呼べる）
+# matplotlib / altair は読み込みに時間がかかるので、グラフを作るときに初めて import する
+
+YOUTUBE_SEARCH = "https://www.youtube.com/results?search_query="
+
+
+# --- YouTubeリンク列を追加する関数 ---
+def add_youtube_link(df, col_name):
+    if df is None or df.empty or col_name not in df.columns:
+        return df
+
+    quote = urllib.parse.quote
+    df['検索リンク'] = [YOUTUBE_SEARCH + quote(f"DDR {song_name} 譜面確認") for song_name in df[col_name]]
+    return df
+
+
+# --- クリア率 ---
+def clear_stats(total_songs, count_revenge, count_unplayed):
+    """全曲数・未クリア数・未プレイ数から、クリア数とクリア率を求める"""
+    # クリア数 = 全曲 - (未クリア + 未プレイ)
+    cleared = total_songs - (count_revenge + count_unplayed)
+    playable = total_songs - count_unplayed
+
+    # 0除算防止
+    if total_songs > 0 and playable > 0:
+        clear_rate = cleared / playable
+        all_clear_rate = cleared / total_songs
+    else:
+        clear_rate = 0
+        all_clear_rate = 0
+    return {
+        "total": total_songs,
+        "cleared": cleared,
+        "playable": playable,
+        "clear_rate": clear_rate,
+        "all_clear_rate": all_clear_rate,
+    }
+
+
+def clear_pie(cleared, playable):
+    """クリア/未クリアの円グラフ。
+    pyplot を通さずに Figure を直接作るので、閉じ忘れても pyplot の図の一覧に溜まらない"""
+    from matplotlib.figure import Figure
+
+    labels = 'clear', 'not clear'
+    sizes = [cleared, playable - cleared]
+    colors = ["#4672C4", '#FF5252']
+
+    fig = Figure(figsize=(4, 4)) # サイズ調整
+    ax = fig.subplots()
+    ax.pie(sizes, labels=labels, autopct='%1.1f%%',
+           startangle=90, counterclock=False,
+           colors=colors, wedgeprops={'edgecolor': 'white'})
+    # 円をきれいな丸にする
+    ax.axis('equal')
+    # 背景を透明にする
+    fig.patch.set_alpha(0)
+    return fig
+
+
+def clear_pie_png(cleared, playable, dpi=200):
+    """円グラフをPNGのバイト列にする（st.pyplot と同じ dpi・余白の詰め方）"""
+    fig = clear_pie(cleared, playable)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+    return buf.getvalue()
+
+
+# --- クリア率の推移 ---
+def progress_chart(df_progress):
+    import altair as alt
+
+    return alt.Chart(df_progress).mark_line(point=True, color='#4672C4').encode(
+        x=alt.X('日時:T', title='日時', axis=alt.Axis(format='%Y/%m/%d')),
+        y=alt.Y('クリア率:Q', title='クリア率', axis=alt.Axis(format='%'), scale=alt.Scale(domain=[0, 1])),
+        tooltip=[alt.Tooltip('日時:T', format='%Y/%m/%d %H:%M'), alt.Tooltip('クリア率:Q', format='.1%'),
+                 'クリア済み:Q', 'リベンジ:Q', '未プレイ:Q']
+    )
+
+
+# --- ワークアウト ---
+def workout_charts(stats, max_points=None):
+    """(日々の推移, プレイ分析) の2つのグラフ。stats は workout_stats.WorkoutStats。
+    ブラウザに送るのは間引いた点だけで、回帰直線もここで計算した2点を渡す"""
+    import altair as alt
+
+    max_points = max_points or workout_stats.MAX_CHART_POINTS
+    chart_df = stats.chart_series(max_points)
+
+    max_cal = chart_df["消費カロリー"].max()
+    max_song = chart_df["曲数"].max()
+    scale_cal = alt.Scale(domain=[0, max_cal])
+    scale_song = alt.Scale(domain=[0, max_song * 1.3])
+
+    base = alt.Chart(chart_df).encode(
+        x=alt.X('日付:T', title='日付', axis=alt.Axis(format='%Y/%m/%d'))
+    )
+    bar = base.mark_bar(color='#FF4B4B', opacity=0.7).encode(
+        y=alt.Y('消費カロリー:Q', title='消費カロリー (kcal)', scale=scale_cal),
+        tooltip=[alt.Tooltip('日付:T', format='%Y/%m/%d'), '消費カロリー:Q', '曲数:Q']
+    )
+    line = base.mark_line(color='#2E86C1', point=True).encode(
+        y=alt.Y('曲数:Q', title='曲数 (曲)', scale=scale_song),
+        tooltip=['日付:T', '消費カロリー:Q', '曲数:Q']
+    )
+    daily = alt.layer(bar, line).resolve_scale(y='independent')
+
+    bubble = alt.Chart(stats.scatter_points(max_points)).mark_circle().encode(
+        x=alt.X('曲数:Q', title='曲数 (曲)', scale=alt.Scale(zero=False)),
+        y=alt.Y('消費カロリー:Q', title='消費カロリー (kcal)', scale=alt.Scale(zero=False)),
+        size=alt.Size('消費カロリー:Q', legend=None, scale=alt.Scale(range=[100, 1000])),
+        color=alt.Color('燃焼効率:Q', title='効率', scale=alt.Scale(scheme='reds')),
+        tooltip=[alt.Tooltip('日付:T', format='%Y/%m/%d'), '曲数:Q', '消費カロリー:Q', '燃焼効率:Q']
+    )
+    trend = alt.Chart(stats.regression_line()).mark_line(color='gray', strokeDash=[5,5]).encode(
+        x='曲数:Q', y='消費カロリー:Q'
+    )
+    return daily, (bubble + trend).interactive()
@@ -1,20 +1,36 @@
+import importlib
 import os
 import subprocess
 import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SCRAPE_WIKI_SCRIPT = os.path.join(BASE_DIR, "scrapping_wiki_data.py")
 SCRAPE_OFFICIAL_SCRIPT = os.path.join(BASE_DIR, "scrape_official_ddr.py")
 ANALYZE_SCRIPT = os.path.join(BASE_DIR, "extract_lv18_separate.py")
 
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
 
-def _run_script(script_path, label):
+import levels as lv
+
+
+def _result(ok, message, data=None, elapsed=0.0):
+    return {"ok": ok, "message": message, "data": data or {}, "elapsed": elapsed}
+
+
+def _run_script(script_path, label, args=()):
+    # 別プロセスで実行するフォールバック（依存モジュールが読み込めない場合など）
     if not os.path.exists(script_path):
-        return f"{label}に失敗: スクリプトが見つかりません ({script_path})"
+        return _result(False, f"{label}に失敗: スクリプトが見つかりません ({script_path})")
 
+    start = time.perf_counter()
     try:
         result = subprocess.run(
-            [sys.executable, script_path],
+            [sys.executable, script_path, *args],
             cwd=BASE_DIR,
             capture_output=True,
             text=True,
@@ -22,22 +38,221 @@ def _run_script(script_path, label):
         )
     except subprocess.CalledProcessError as exc:
         output = exc.stdout or exc.stderr or ""
-        return f"{label}に失敗: {output.strip()}"
+        return _result(False, f"{label}に失敗: {output.strip()}")
     except Exception as exc:
-        return f"{label}に失敗: {exc}"
+        return _result(False, f"{label}に失敗: {exc}")
 
+    elapsed = time.perf_counter() - start
     if result.stdout:
-        return f"{label}に成功\n{result.stdout.strip()}"
-    return f"{label}に成功"
+        return _result(True, f"{label}に成功\n{result.stdout.strip()}", elapsed=elapsed)
+    return _result(True, f"{label}に成功", elapsed=elapsed)
+
+
+def _run_inprocess(module_name, func_name, script_path, label, summary, **kwargs):
+    # 同じプロセス内で関数を直接呼ぶ（インタプリタ起動・pandas再importを省く）
+    try:
+        func = getattr(importlib.import_module(module_name), func_name)
+    except (ImportError, AttributeError):
+        args = [str(level) for level in lv.parse_levels(kwargs.get("levels"))]
+        if kwargs.get("offline"):
+            args.append("--offline")
+        if kwargs.get("player"):
+            args += ["--player", kwargs["player"]]
+        return _run_script(script_path, label, args)
+
+    start = time.perf_counter()
+    try:
+        data = func(**kwargs)
+    except Exception as exc:
+        return _result(False, f"{label}に失敗: {exc}", elapsed=time.perf_counter() - start)
+
+    elapsed = time.perf_counter() - start
+    return _result(True, f"{label}に成功 ({elapsed:.1f}秒)\n{summary(data)}", data, elapsed)
+
+
+def _levels_text(data):
+    return ", ".join(f"Lv{level}" for level in data.get("levels", {}))
+
+
+def _wiki_summary(data):
+    if data.get("status") == "unchanged":
+        text = f"{_levels_text(data)}: 変更なし ({data['songs']}曲)"
+    else:
+        changed = ", ".join(f"Lv{level}" for level in data.get("changed", []))
+        text = f"{_levels_text(data)}: {data['songs']}曲を取得しました (更新: {changed})"
+    if data.get("skipped"):
+        skipped = ", ".join(f"Lv{level}" for level in data["skipped"])
+        text += f"\n{skipped}: WikiページのURLが未登録のためスキップしました (levels.WIKI_PAGES)"
+    return text
+
+
+def update_wiki_data(levels=None, offline=False, progress=None):
+    # 曲リストが前回と同じなら data["status"] が "unchanged"（datastoreは書き換えない）
+    return _run_inprocess(
+        "scrapping_wiki_data", "scrape_wiki", SCRAPE_WIKI_SCRIPT, "Wiki更新", _wiki_summary,
+        levels=levels, offline=offline, progress=progress,
+    )
+
+
+def update_official_data(levels=None, progress=None, player=None):
+    # player を指定すると、そのプレイヤーとしてログインし、そのプレイヤーのDBに保存する
+    return _run_inprocess(
+        "scrape_official_ddr", "scrape_official", SCRAPE_OFFICIAL_SCRIPT, "公式データ更新",
+        lambda d: f"{_levels_text(d)}: スコア {d['scores']}曲 ({d['pages']}ページ) / ワークアウト {d['workouts']}件",
+        levels=levels, progress=progress, player=player,
+    )
+
+
+def analyze_data(levels=None, wiki_frames=None, progress=None):
+    return _run_inprocess(
+        "extract_lv18_separate", "run_analysis", ANALYZE_SCRIPT, "分析",
+        lambda d: f"{_levels_text(d)}: リベンジ {d['revenge']}曲 / 未プレイ {d['unplayed']}曲 / クリア済み {d['cleared']}曲",
+        levels=levels, wiki_frames=wiki_frames, progress=progress,
+    )
+
+
+# ==========================================
+# バックグラウンドジョブ（画面を止めずに更新する）
+# ==========================================
+# 同じ種類のジョブは（公式データ更新はプレイヤーごとに）同時に1つだけ。
+# 実行中に同じボタンが押されたら、実行中のジョブのIDを返す
+JOB_WORKERS = 2
+MAX_FINISHED_JOBS = 20
+
+JOB_LABELS = {"wiki": "Wiki更新", "official": "公式データ更新"}
+PHASE_LABELS = {
+    "queued": "待機中",
+    "wiki": "Wiki取得",
+    "login": "ログイン",
+    "scores": "スコア取得",
+    "workout": "ワークアウト取得",
+    "analyze": "分析",
+}
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="ddr-job")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class Job:
+    """1回の更新処理。スクレイパーからは report() で進み具合が書き込まれ、画面は snapshot() を読む"""
+
+    def __init__(self, kind, levels, player=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.levels = levels
+        self.player = player
+        self.state = "queued"     # queued / running / done / failed
+        self.phase = "queued"
+        self.detail = ""
+        self.current = None
+        self.total = None
+        self.messages = []
+        self.created = time.time()
+        self.finished = None
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running")
+
+    def report(self, phase, detail="", current=None, total=None):
+        with _jobs_lock:
+            self.phase, self.detail, self.current, self.total = phase, detail, current, total
+
+    def snapshot(self):
+        with _jobs_lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "label": JOB_LABELS.get(self.kind, self.kind),
+                "levels": self.levels,
+                "player": self.player,
+                "state": self.state,
+                "active": self.active,
+                "ok": self.state == "done",
+                "phase": self.phase,
+                "phase_label": PHASE_LABELS.get(self.phase, self.phase),
+                "detail": self.detail,
+                "current": self.current,
+                "total": self.total,
+                "message": "\n".join(self.messages),
+                "elapsed": (self.finished or time.time()) - self.created,
+            }
+
+
+def _run_wiki_job(job):
+    res = update_wiki_data(job.levels, progress=job.report)
+    yield res
+    # 曲リストが変わったレベルだけ分析し直す
+    changed = res["data"].get("changed") if res["ok"] else None
+    if changed:
+        yield analyze_data(changed, progress=job.report)
+
+
+def _run_official_job(job):
+    res = update_official_data(job.levels, progress=job.report, player=job.player)
+    yield res
+    # 分析結果を保存するのは既定のプレイヤーだけ（他のプレイヤーの一覧は players が画面表示時に分類する）
+    if res["ok"] and job.player in (None, "default"):
+        yield analyze_data(job.levels, progress=job.report)
+
+
+JOB_RUNNERS = {"wiki": _run_wiki_job, "official": _run_official_job}
+
+
+def _run_job(job):
+    with _jobs_lock:
+        job.state = "running"
+    ok = True
+    try:
+        for res in JOB_RUNNERS[job.kind](job):
+            ok = ok and res["ok"]
+            with _jobs_lock:
+                job.messages.append(res["message"])
+    except Exception as exc:
+        ok = False
+        with _jobs_lock:
+            job.messages.append(f"{JOB_LABELS.get(job.kind, job.kind)}に失敗: {exc}")
+    with _jobs_lock:
+        job.state = "done" if ok else "failed"
+        job.finished = time.time()
+
+
+def _prune_jobs():
+    finished = sorted((j for j in _jobs.values() if not j.active), key=lambda j: j.finished)
+    for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job.id]
+
+
+def submit_job(kind, levels=None, player=None):
+    """ジョブを登録してすぐにIDを返す（処理は裏のスレッドで進む）。
+    同じ種類のジョブが実行中なら、新しく始めずにそのジョブのIDを返す。
+    player は公式データ更新だけが使う（Wikiの曲リストは全員で共有）"""
+    if kind not in JOB_RUNNERS:
+        raise ValueError(f"不明なジョブです: {kind}")
+    levels = lv.parse_levels(levels)
+    player = player if kind == "official" else None
+    with _jobs_lock:
+        for job in _jobs.values():
+            if job.kind == kind and job.player == player and job.active:
+                return job.id
+        job = Job(kind, levels, player)
+        _jobs[job.id] = job
+        _prune_jobs()
+    _executor.submit(_run_job, job)
+    return job.id
 
 
-def update_wiki_data():
-    return _run_script(SCRAPE_WIKI_SCRIPT, "Wiki更新")
+def get_job(job_id):
+    """ジョブの状態（dict）。見つからなければ None"""
+    job = _jobs.get(job_id)
+    return job.snapshot() if job else None
 
 
-def update_official_data():
-    return _run_script(SCRAPE_OFFICIAL_SCRIPT, "公式データ更新")
+def list_jobs(active_only=False):
+    jobs = sorted(_jobs.values(), key=lambda j: j.created)
+    return [job.snapshot() for job in jobs if job.active or not active_only]
 
 
-def analyze_data():
-    return _run_script(ANALYZE_SCRIPT, "分析")
+def has_active_jobs():
+    return any(job.active for job in list(_jobs.values()))
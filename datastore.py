@@ -0,0 +1,511 @@
+import contextvars
+import os
+import sqlite3
+from contextlib import closing, contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+import lamps
+import levels as lv
+import title_normalize
+
+# ==========================================
+# 設定エリア
+# ==========================================
+base_dir = os.path.dirname(os.path.abspath(__file__))
+DB_FILE = os.path.join(base_dir, "ddr_data.sqlite3")
+
+DIFFICULTIES = {"EXPERT": "EXPERT判定", "CHALLENGE": "CHALLENGE判定"}
+SCORE_COLUMNS = {"EXPERT": "EXPERTスコア", "CHALLENGE": "CHALLENGEスコア"}
+# ==========================================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+-- Wikiの曲リスト（status は分析結果: revenge / unplayed / cleared）
+CREATE TABLE IF NOT EXISTS charts (
+    level       INTEGER NOT NULL,
+    title       TEXT    NOT NULL,
+    fingerprint TEXT    NOT NULL,
+    position    INTEGER NOT NULL,
+    status      TEXT CHECK (status IN ('revenge', 'unplayed', 'cleared')),
+    PRIMARY KEY (level, title)
+);
+CREATE INDEX IF NOT EXISTS idx_charts_fingerprint ON charts (fingerprint, level);
+CREATE INDEX IF NOT EXISTS idx_charts_status ON charts (level, status, position);
+
+-- 公式サイトのクリア状況（1譜面1行。status は lamps.LABELS の文字列、score は点数で分からなければ NULL）
+CREATE TABLE IF NOT EXISTS scores (
+    level       INTEGER NOT NULL,
+    title       TEXT    NOT NULL,
+    fingerprint TEXT    NOT NULL,
+    difficulty  TEXT    NOT NULL CHECK (difficulty IN ('EXPERT', 'CHALLENGE')),
+    status      TEXT    NOT NULL,
+    position    INTEGER NOT NULL,
+    score       INTEGER,
+    PRIMARY KEY (level, title, difficulty)
+);
+CREATE INDEX IF NOT EXISTS idx_scores_fingerprint ON scores (level, fingerprint, difficulty);
+
+-- クロール履歴（score_changes には前回から判定かスコアが変わった譜面だけを記録。status NULL は削除）
+CREATE TABLE IF NOT EXISTS crawls (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    level      INTEGER NOT NULL,
+    crawled_at TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_crawls_level ON crawls (level, crawled_at);
+
+CREATE TABLE IF NOT EXISTS score_changes (
+    crawl_id   INTEGER NOT NULL REFERENCES crawls (id),
+    level      INTEGER NOT NULL,
+    title      TEXT    NOT NULL,
+    difficulty TEXT    NOT NULL,
+    status     TEXT,
+    score      INTEGER,
+    PRIMARY KEY (crawl_id, title, difficulty)
+);
+CREATE INDEX IF NOT EXISTS idx_score_changes_level ON score_changes (level, crawl_id);
+
+-- 曲名の手動対応付け（Wikiの譜面名 -> 公式の曲名。official_title NULL は「対応なし」）
+CREATE TABLE IF NOT EXISTS title_overrides (
+    title          TEXT PRIMARY KEY,
+    official_title TEXT
+);
+
+-- 曲名 -> 指紋 のキャッシュ（同じ曲名を二度正規化しない。指紋の作り方が変わったら作り直す）
+CREATE TABLE IF NOT EXISTS fingerprint_cache (
+    title       TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL
+);
+
+-- ワークアウト（1日1行。日付で上書きするので過去の日も全て残る）
+CREATE TABLE IF NOT EXISTS workouts (
+    date  TEXT PRIMARY KEY,
+    songs INTEGER,
+    kcal  REAL
+);
+"""
+
+
+def _fingerprints(conn, titles):
+    # プロセス内キャッシュ → ディスク上のキャッシュ → 正規化 の順に引き、新しい曲名だけ追記する
+    def save(pairs):
+        conn.executemany("INSERT OR REPLACE INTO fingerprint_cache (title, fingerprint) VALUES (?, ?)", pairs)
+    return title_normalize.fingerprints(titles, on_new=save).tolist()
+
+
+def _refresh_fingerprints(conn):
+    # 指紋の作り方が変わったら、キャッシュと保存済みの指紋を作り直す
+    if _get_meta(conn, "fingerprint_version") == title_normalize.FINGERPRINT_VERSION:
+        title_normalize.remember(conn.execute("SELECT title, fingerprint FROM fingerprint_cache"))
+        return
+    conn.execute("DELETE FROM fingerprint_cache")
+    for table in ("charts", "scores"):
+        titles = [row[0] for row in conn.execute(f"SELECT DISTINCT title FROM {table}")]
+        conn.executemany(
+            f"UPDATE {table} SET fingerprint = ? WHERE title = ?",
+            zip(_fingerprints(conn, titles), titles),
+        )
+    _set_meta(conn, "fingerprint_version", title_normalize.FINGERPRINT_VERSION)
+
+
+# --- 接続 ---
+_initialized = set()
+
+
+def connect(path=None):
+    path = path or DB_FILE
+    conn = sqlite3.connect(path, timeout=30)
+    if path not in _initialized:
+        # スキーマ作成と初回のCSV取り込みはプロセスごとに1回だけ
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        _add_missing_columns(conn)
+        if not _get_meta(conn, "migrated"):
+            with conn:
+                # 旧CSVは既定のDBにだけ取り込む（プレイヤーごとのDBは空から始める）
+                if path == DB_FILE:
+                    _import_legacy_csv(conn)
+                _set_meta(conn, "migrated", 1)
+        with conn:
+            _record_history_baseline(conn)
+            _refresh_fingerprints(conn)
+        _initialized.add(path)
+    return conn
+
+
+# 既存のDBに後から足した列
+ADDED_COLUMNS = (("scores", "score", "INTEGER"), ("score_changes", "score", "INTEGER"))
+
+
+def _add_missing_columns(conn):
+    for table, column, decl in ADDED_COLUMNS:
+        if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _get_meta(conn, key, default=0):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_meta(conn, key, value):
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+        (key, value),
+    )
+
+
+def _bump_revision(conn, key="revision"):
+    # 書き込みのたびに増える番号（app.py のキャッシュキーに使う）。
+    # "charts_revision" はWikiの曲リストを書き換えたときだけ増える（共有の曲リストの読み直し用）
+    _set_meta(conn, key, _get_meta(conn, key) + 1)
+
+
+def revision(path=None, key="revision"):
+    with reader(path) as conn:
+        return _get_meta(conn, key)
+
+
+# --- 読み込みの版を固定する ---
+# snapshot() の中の読み込みは、入った時点の1つの版だけを見る（WALの読み取りトランザクション）。
+# 書き込みは待たされず、読む側も書き込みの途中の状態や、表ごとに違う版を見ることが無い
+_pinned = contextvars.ContextVar("datastore_pinned", default={})
+
+
+@contextmanager
+def snapshot(*paths):
+    """with の中では、指定したDB（省略時は DB_FILE）の読み込みを同じ版に固定する。入れ子にしてもよい"""
+    pinned = dict(_pinned.get())
+    opened = []
+    try:
+        for path in dict.fromkeys(p or DB_FILE for p in paths or (None,)):
+            if path in pinned:
+                continue
+            conn = connect(path)
+            opened.append(conn)
+            conn.execute("BEGIN")
+            _get_meta(conn, "revision")   # 最初に読んだ時点で版が決まる
+            pinned[path] = conn
+        token = _pinned.set(pinned)
+        try:
+            yield
+        finally:
+            _pinned.reset(token)
+    finally:
+        for conn in opened:
+            conn.rollback()
+            conn.close()
+
+
+@contextmanager
+def reader(path=None):
+    """読み込み用の接続。snapshot() の中なら固定した版の接続を使う（閉じない）"""
+    conn = _pinned.get().get(path or DB_FILE)
+    if conn is not None:
+        yield conn
+        return
+    with closing(connect(path)) as conn:
+        yield conn
+
+
+# ==========================================
+# 書き込み（すべてupsert。1回の呼び出しが1トランザクション）
+# ==========================================
+def _replace_level_rows(conn, table, level, keys):
+    # 今回のデータに含まれない行（曲リストから消えた曲など）を削除
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS _incoming (title TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM _incoming")
+    conn.executemany("INSERT OR IGNORE INTO _incoming (title) VALUES (?)", ((k,) for k in keys))
+    conn.execute(
+        f"DELETE FROM {table} WHERE level = ? AND title NOT IN (SELECT title FROM _incoming)", (level,)
+    )
+
+
+def _write_charts(conn, level, titles):
+    titles = [str(t).strip() for t in titles]
+    fingerprints = _fingerprints(conn, titles)
+    conn.executemany(
+        """INSERT INTO charts (level, title, fingerprint, position) VALUES (?, ?, ?, ?)
+           ON CONFLICT (level, title) DO UPDATE
+           SET fingerprint = excluded.fingerprint, position = excluded.position""",
+        ((level, t, fp, i) for i, (t, fp) in enumerate(zip(titles, fingerprints))),
+    )
+    _replace_level_rows(conn, "charts", level, titles)
+
+
+def _record_changes(conn, level, records, crawled_at=None):
+    # 前回の状態と比べて、判定かスコアが変わった譜面だけを履歴に追記する
+    # （判定が同じままでもベストスコアが伸びれば記録する。前回のスコアが無い＝スコア保存前のデータは比べない）
+    previous = {
+        (title, difficulty): (status, score)
+        for title, difficulty, status, score in conn.execute(
+            "SELECT title, difficulty, status, score FROM scores WHERE level = ?", (level,)
+        )
+    }
+    current = {(title, difficulty): (status, score) for _, title, _, difficulty, status, _, score in records}
+    changes = []
+    for key, (status, score) in current.items():
+        old = previous.get(key)
+        if old is None or old[0] != status or (old[1] is not None and old[1] != score):
+            changes.append((*key, status, score))
+    changes += [(k[0], k[1], None, None) for k in previous.keys() - current.keys()]
+
+    cur = conn.execute(
+        "INSERT INTO crawls (level, crawled_at) VALUES (?, ?)",
+        (level, crawled_at or datetime.now().isoformat(timespec="seconds")),
+    )
+    conn.executemany(
+        """INSERT INTO score_changes (crawl_id, level, title, difficulty, status, score)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        ((cur.lastrowid, level, title, difficulty, status, score) for title, difficulty, status, score in changes),
+    )
+    return len(changes)
+
+
+def _record_history_baseline(conn):
+    # 履歴機能より前に保存されたスコアを、最初のスナップショットとして登録する
+    levels = [row[0] for row in conn.execute(
+        "SELECT DISTINCT level FROM scores WHERE level NOT IN (SELECT level FROM crawls)"
+    )]
+    for level in levels:
+        cur = conn.execute(
+            "INSERT INTO crawls (level, crawled_at) VALUES (?, ?)",
+            (level, datetime.now().isoformat(timespec="seconds")),
+        )
+        conn.execute(
+            """INSERT INTO score_changes (crawl_id, level, title, difficulty, status, score)
+               SELECT ?, level, title, difficulty, status, score FROM scores WHERE level = ?""",
+            (cur.lastrowid, level),
+        )
+
+
+def _write_scores(conn, level, rows, crawled_at=None):
+    # 行は [曲名, EXPERT判定, CHALLENGE判定] か、スコア付きの [..., EXPERTスコア, CHALLENGEスコア]
+    rows = [(str(title), expert, challenge, *(list(scores) + [None, None])[:2])
+            for title, expert, challenge, *scores in rows]
+    titles = [row[0] for row in rows]
+    records = []
+    for i, ((title, expert, challenge, expert_score, challenge_score), fp) in enumerate(
+        zip(rows, _fingerprints(conn, titles))
+    ):
+        records.append((level, title, fp, "EXPERT", str(expert), i, _to_number(expert_score, int)))
+        records.append((level, title, fp, "CHALLENGE", str(challenge), i, _to_number(challenge_score, int)))
+    changed = _record_changes(conn, level, records, crawled_at)
+    conn.executemany(
+        """INSERT INTO scores (level, title, fingerprint, difficulty, status, position, score)
+           VALUES (?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT (level, title, difficulty) DO UPDATE
+           SET fingerprint = excluded.fingerprint, status = excluded.status, position = excluded.position,
+               score = excluded.score""",
+        records,
+    )
+    _replace_level_rows(conn, "scores", level, titles)
+    return changed
+
+
+def _to_number(value, cast):
+    if value is None:
+        return None
+    try:
+        return cast(str(value).strip())
+    except ValueError:
+        return None
+
+
+def _write_workouts(conn, rows):
+    conn.executemany(
+        """INSERT INTO workouts (date, songs, kcal) VALUES (?, ?, ?)
+           ON CONFLICT (date) DO UPDATE SET songs = excluded.songs, kcal = excluded.kcal""",
+        ((str(d).strip(), _to_number(s, int), _to_number(k, float)) for d, s, k in rows),
+    )
+
+
+def _write_status(conn, level, revenge, unplayed):
+    conn.execute("UPDATE charts SET status = 'cleared' WHERE level = ?", (level,))
+    for status, titles in (("revenge", revenge), ("unplayed", unplayed)):
+        conn.executemany(
+            "UPDATE charts SET status = ? WHERE level = ? AND title = ?",
+            ((status, level, str(t).strip()) for t in titles),
+        )
+
+
+def replace_charts(level, titles, path=None):
+    """Wikiの曲リストを保存（リストから消えた曲は削除）"""
+    with closing(connect(path)) as conn, conn:
+        _write_charts(conn, level, titles)
+        _bump_revision(conn)
+        _bump_revision(conn, "charts_revision")
+
+
+def upsert_scores(level, rows, path=None, crawled_at=None):
+    """[曲名, EXPERT判定, CHALLENGE判定(, EXPERTスコア, CHALLENGEスコア)] の行を保存（今回のクロールに無い曲は削除）。
+    判定が変わった譜面の数を返す"""
+    with closing(connect(path)) as conn, conn:
+        changed = _write_scores(conn, level, rows, crawled_at)
+        _bump_revision(conn)
+    return changed
+
+
+def upsert_workouts(rows, path=None):
+    """[日付, 曲数, 消費カロリー] の行を保存（日付ごとに上書き、過去の日は残る）"""
+    with closing(connect(path)) as conn, conn:
+        _write_workouts(conn, rows)
+        _bump_revision(conn)
+
+
+def set_chart_status(level, revenge, unplayed, path=None):
+    """分析結果を保存。revenge / unplayed に無い曲は cleared になる"""
+    with closing(connect(path)) as conn, conn:
+        _write_status(conn, level, revenge, unplayed)
+        _bump_revision(conn)
+
+
+def set_title_override(title, official_title, path=None):
+    """Wikiの譜面名を公式の曲名に手動で対応付ける（official_title=None で「対応なし」に固定）"""
+    with closing(connect(path)) as conn, conn:
+        conn.execute(
+            """INSERT INTO title_overrides (title, official_title) VALUES (?, ?)
+               ON CONFLICT (title) DO UPDATE SET official_title = excluded.official_title""",
+            (str(title).strip(), official_title),
+        )
+        _bump_revision(conn)
+
+
+def delete_title_override(title, path=None):
+    with closing(connect(path)) as conn, conn:
+        conn.execute("DELETE FROM title_overrides WHERE title = ?", (str(title).strip(),))
+        _bump_revision(conn)
+
+
+# ==========================================
+# 読み込み（app.py や分析処理はここから取る）
+# ==========================================
+def _query(sql, params=(), path=None):
+    with reader(path) as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+def has_data(table, level, path=None):
+    if table not in ("charts", "scores"):
+        raise ValueError(f"不明なテーブルです: {table}")
+    with reader(path) as conn:
+        return conn.execute(f"SELECT 1 FROM {table} WHERE level = ? LIMIT 1", (level,)).fetchone() is not None
+
+
+def load_charts(level, path=None):
+    return _query("SELECT title AS 曲名 FROM charts WHERE level = ? ORDER BY position", (level,), path)
+
+
+def load_scores(level, path=None):
+    """曲名, EXPERT判定, CHALLENGE判定（lamps.DTYPE のカテゴリ型）, EXPERTスコア, CHALLENGEスコア（Int64）"""
+    df = _query(
+        "SELECT title, difficulty, status, score, position FROM scores WHERE level = ? ORDER BY position",
+        (level,), path,
+    )
+    columns = ["曲名", *DIFFICULTIES.values(), *SCORE_COLUMNS.values()]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    wide = df.pivot(index=["position", "title"], columns="difficulty", values=["status", "score"])
+    status = wide["status"].reindex(columns=list(DIFFICULTIES))
+    score = wide["score"].reindex(columns=list(DIFFICULTIES))
+    result = pd.DataFrame({"曲名": wide.index.get_level_values("title")})
+    for difficulty in DIFFICULTIES:
+        result[DIFFICULTIES[difficulty]] = lamps.categorical(status[difficulty].to_numpy())
+    for difficulty in DIFFICULTIES:
+        result[SCORE_COLUMNS[difficulty]] = pd.array(pd.to_numeric(score[difficulty]).to_numpy(), dtype="Int64")
+    return result[columns]
+
+
+def load_revenge(level, path=None):
+    return _query(
+        "SELECT title AS 曲名 FROM charts WHERE level = ? AND status = 'revenge' ORDER BY position",
+        (level,), path,
+    )
+
+
+def load_unplayed(level, path=None):
+    return _query(
+        "SELECT title AS 未プレイ曲名 FROM charts WHERE level = ? AND status = 'unplayed' ORDER BY position",
+        (level,), path,
+    )
+
+
+def load_workouts(path=None):
+    return _query(
+        "SELECT date AS 日付, songs AS 曲数, kcal AS 消費カロリー FROM workouts ORDER BY date DESC",
+        path=path,
+    )
+
+
+def fingerprints(titles, path=None):
+    """曲名の並びを指紋のリストにする（ディスク上のキャッシュを使い、新しい曲名は追記する）"""
+    with closing(connect(path)) as conn, conn:
+        return _fingerprints(conn, titles)
+
+
+def load_title_overrides(path=None):
+    """{Wikiの譜面名: 公式の曲名 or None}"""
+    with reader(path) as conn:
+        return dict(conn.execute("SELECT title, official_title FROM title_overrides"))
+
+
+LOADERS = {
+    "charts": load_charts,
+    "scores": load_scores,
+    "revenge": load_revenge,
+    "unplayed": load_unplayed,
+}
+
+
+def load(kind, level=None, path=None):
+    if kind == "workouts":
+        return load_workouts(path)
+    return LOADERS[kind](level, path)
+
+
+# ==========================================
+# CSV 入出力
+# ==========================================
+def export_csv(kind, level=None, path=None):
+    """サイドバーからダウンロードできるCSV（Excelで開けるようBOM付き）"""
+    return load(kind, level, path).to_csv(index=False).encode("utf-8-sig")
+
+
+def _read_legacy(filename):
+    if not os.path.exists(filename):
+        return None
+    try:
+        return pd.read_csv(filename)
+    except Exception:
+        return None
+
+
+def _import_legacy_csv(conn):
+    # 初回だけ、これまでのCSVファイルを取り込む
+    for level in lv.ALL_LEVELS:
+        df_wiki = _read_legacy(lv.wiki_file(level))
+        if df_wiki is not None:
+            _write_charts(conn, level, df_wiki.iloc[:, 0].dropna())
+
+        df_my = _read_legacy(lv.score_file(level))
+        if df_my is not None:
+            rows = df_my.reindex(columns=["曲名", *DIFFICULTIES.values()]).fillna("").itertuples(index=False)
+            _write_scores(conn, level, rows)
+
+        df_revenge = _read_legacy(lv.revenge_file(level))
+        df_unplayed = _read_legacy(lv.unplayed_file(level))
+        if df_wiki is not None and (df_revenge is not None or df_unplayed is not None):
+            revenge = df_revenge.iloc[:, 0].dropna() if df_revenge is not None else []
+            unplayed = df_unplayed.iloc[:, 0].dropna() if df_unplayed is not None else []
+            _write_status(conn, level, revenge, unplayed)
+
+    df_cal = _read_legacy(os.path.join(base_dir, "my_calorie_data.csv"))
+    if df_cal is not None:
+        _write_workouts(conn, df_cal.iloc[:, :3].itertuples(index=False))
+    _bump_revision(conn)
+    _bump_revision(conn, "charts_revision")
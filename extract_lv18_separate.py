@@ -1,110 +1,234 @@
+import numpy as np
 import pandas as pd
-import re
 import os
-import unicodedata
+import sys
+import time
+
+import datastore
+import lamps
+import levels as lv
+import title_matcher
+import tracing
+from title_normalize import create_fingerprint, fingerprints  # create_fingerprint はここからも import できるよう残す
 
 # ==========================================
 # 設定エリア
 # ==========================================
 base_dir = os.path.dirname(os.path.abspath(__file__))
 
-wiki_file = os.path.join(base_dir, "DDR18_songs.csv")
-my_data_file = os.path.join(base_dir, "my_ddr_data.csv")
-
-revenge_file = os.path.join(base_dir, "lv18_revenge.csv")
-unplayed_file = os.path.join(base_dir, "lv18_unplayed.csv")
+# 入出力は datastore（SQLite）のレベルごとのデータ:
+#   charts + scores -> charts.status (revenge / unplayed / cleared)
 # ==========================================
 
-print(f"参照先: {base_dir}")
-print("記号・空白を全て無視して照合します...")
-
-# --- 強力な正規化関数 ---
-def create_fingerprint(text):
-    if pd.isna(text): return ""
-    text = str(text)
-    # 1. NFKC正規化（全角英数を半角になど）
-    text = unicodedata.normalize('NFKC', text)
-    # 2. 難易度表記 (鬼)(激) などを先に削除（これは曲名ではないので）
-    #    ※ ただし (X-Special) や (2025 edit) みたいな曲名の一部は残したい
-    #    → 難易度表記は末尾にあるはずなので、末尾の特定の文字だけ消す
-    text = re.sub(r'\((鬼|激|踊|楽|習)\)$', '', text)
-    
-    # 3. 英数字と日本語（ひらがな・カタカナ・漢字）以外を全て削除
-    #    記号（~, -, ", space）は全て消え去る
-    text = re.sub(r'[^a-zA-Z0-9\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]', '', text)
-    
-    # 4. 大文字小文字も無視（全て小文字へ）
-    return text.lower()
-
-try:
-    # 1. データ読み込み
-    df_wiki = pd.read_csv(wiki_file)
-    df_my = pd.read_csv(my_data_file)
-    
+# 曲名の正規化（指紋）は title_normalize にある
+
+
+# --- 判定列の引き当て（lamps.Lamp の int8 番号で） ---
+def _lookup_lamps(positions, my_index, col):
+    # positions は my_index の行番号（見つからない譜面は -1）。列が無ければ「データなし」
+    if col not in my_index.columns:
+        return np.full(len(positions), lamps.Lamp.NO_DATA, dtype=np.int8)
+    table = np.append(lamps.codes(my_index[col]), np.int8(lamps.Lamp.NO_DATA))
+    return table[positions]   # -1 は末尾の「データなし」を引く
+
+
+# --- 指紋が一致しない曲名の対応付け（手動指定 → n-gram索引によるあいまい照合） ---
+def resolve_aliases(df_wiki, df_my, overrides=None, min_confidence=title_matcher.MIN_CONFIDENCE,
+                    fingerprint=fingerprints):
+    """({Wikiの譜面名: 公式の曲名 or None}, 照合結果のリスト) を返す。
+    照合結果は title / match / confidence / source ("override" or "fuzzy") / accepted のdict"""
     wiki_col = df_wiki.columns[0]
     my_col = "曲名" if "曲名" in df_my.columns else df_my.columns[0]
+    overrides = overrides or {}
 
-    # 自分のデータの「照合用フィンガープリント」を作成
-    df_my['fingerprint'] = df_my[my_col].apply(create_fingerprint)
-
-    revenge_list = []
-    unplayed_list = []
-
-    # 2. 全曲チェック
-    for index, row in df_wiki.iterrows():
-        raw_name = str(row[wiki_col]).strip()
-        
-        # Wiki側の名前もフィンガープリント化
-        search_key = create_fingerprint(raw_name)
-        
-        # 難易度判定
-        # 鬼や激がついているかを判定
-        target_mode = "BOTH"
-        if "(鬼)" in raw_name: target_mode = "CHALLENGE判定"
-        elif "(激)" in raw_name: target_mode = "EXPERT判定"
-
-        # 照合
-        # 「完全に一致するもの」を探す
-        # ※ 部分一致だと危ないので完全一致推奨だが、これで合わなければ前方一致も検討
-        user_row = df_my[df_my['fingerprint'] == search_key]
-        
-        status = "未プレイ" # デフォルト
-        
-        if not user_row.empty:
-            # データが見つかった！
-            if target_mode == "BOTH":
-                e = str(user_row.iloc[0].get("EXPERT判定", ""))
-                c = str(user_row.iloc[0].get("CHALLENGE判定", ""))
-                if "未クリア" in e or "未クリア" in c: 
-                    status = "未クリア"
-                elif "クリア済み" in e and "クリア済み" in c:
-                    status = "クリア済み"
-                else:
-                    if "未クリア" in e: status = "未クリア"
-            else:
-                val = user_row.iloc[0].get(target_mode, "")
-                if pd.notna(val):
-                    status = str(val)
-
-        # 3. 分別処理
-        if "未クリア" in status:
-            revenge_list.append(raw_name)
-        elif "クリア済み" in status:
+    official = df_my[my_col].dropna().astype(str)
+    known = set(fingerprint(official))
+    matcher = None
+
+    names = df_wiki[wiki_col].map(lambda v: str(v).strip()).unique().tolist()
+    aliases = {}
+    matches = []
+    for name, fp in zip(names, fingerprint(names)):
+        if name in overrides:
+            target = overrides[name]
+            aliases[name] = target
+            matches.append({"title": name, "match": target, "confidence": 1.0,
+                            "source": "override", "accepted": target is not None})
+            continue
+        if fp in known:
             continue
+
+        # 索引は完全一致しない曲があったときだけ作る
+        if matcher is None:
+            matcher = title_matcher.TitleMatcher(official)
+        best, confidence = matcher.match(name, min_confidence)
+        if best is not None:
+            aliases[name] = best
         else:
-            unplayed_list.append(raw_name)
-
-    # 4. 保存
-    if revenge_list:
-        pd.DataFrame(revenge_list, columns=["曲名"]).to_csv(revenge_file, index=False, encoding='utf-8_sig')
-        print(f"リベンジリスト: {len(revenge_list)}曲")
-    
-    if unplayed_list:
-        pd.DataFrame(unplayed_list, columns=["未プレイ曲名"]).to_csv(unplayed_file, index=False, encoding='utf-8_sig')
-        print(f"未プレイリスト: {len(unplayed_list)}曲（ここに入っている曲を確認してください）")
-        if len(unplayed_list) < 10:
-             print("※ 残りわずかなので、具体的に表示します:")
-             print(pd.DataFrame(unplayed_list))
-
-except Exception as e:
-    print(f"エラー: {e}")
+            candidates = matcher.candidates(name, limit=1)
+            if not candidates or candidates[0][1] < title_matcher.MIN_SUGGESTION:
+                continue
+            confidence = candidates[0][1]
+        matches.append({"title": name, "match": best or candidates[0][0], "confidence": confidence,
+                        "source": "fuzzy", "accepted": best is not None})
+    return aliases, matches
+
+
+# --- 全曲を「リベンジ / クリア済み / 未プレイ」に分類 ---
+def classify_charts(df_wiki, df_my, aliases=None, fingerprint=fingerprints):
+    """Wikiの曲リストと自分のスコアを照合し、(リベンジ曲名リスト, 未プレイ曲名リスト) を返す。
+    aliases ({Wikiの譜面名: 公式の曲名 or None}) があれば、その譜面は指定の曲名で照合する。
+    fingerprint は曲名の並びを指紋の並びにする関数（既定はプロセス内キャッシュ付きの一括正規化）"""
+    wiki_col = df_wiki.columns[0]
+    my_col = "曲名" if "曲名" in df_my.columns else df_my.columns[0]
+
+    names = df_wiki[wiki_col].map(lambda v: str(v).strip())
+    aliases = aliases or {}
+    keys = pd.Series(fingerprint(names.map(lambda v: aliases.get(v) or v)), index=names.index)
+    blocked = names.map(lambda v: v in aliases and aliases[v] is None)
+
+    # 自分のデータをフィンガープリントで索引化（重複時は先頭行を採用）
+    my_index = (
+        df_my.assign(fingerprint=list(fingerprint(df_my[my_col])))
+        .drop_duplicates("fingerprint", keep="first")
+        .set_index("fingerprint")
+    )
+
+    positions = my_index.index.get_indexer(keys)
+    found = (positions >= 0) & ~blocked.to_numpy()
+    # 判定は文字列を種類ごとに1回だけ読み、以降は番号の比較だけで分類する
+    e = _lookup_lamps(positions, my_index, "EXPERT判定")
+    c = _lookup_lamps(positions, my_index, "CHALLENGE判定")
+    e_ng, c_ng = e == lamps.Lamp.FAILED, c == lamps.Lamp.FAILED
+    e_ok, c_ok = e >= lamps.Lamp.CLEAR, c >= lamps.Lamp.CLEAR
+
+    # 難易度判定: 鬼→CHALLENGE, 激→EXPERT, どちらも無ければ両方見る
+    is_cha = names.str.contains("(鬼)", regex=False).to_numpy()
+    is_exp = ~is_cha & names.str.contains("(激)", regex=False).to_numpy()
+    is_both = ~is_cha & ~is_exp
+
+    revenge = found & ((is_both & (e_ng | c_ng)) | (is_cha & c_ng) | (is_exp & e_ng))
+    cleared = found & ((is_both & e_ok & c_ok) | (is_cha & c_ok) | (is_exp & e_ok))
+    unplayed = ~revenge & ~cleared
+
+    return names[revenge].tolist(), names[unplayed].tolist()
+
+
+# --- 1譜面だけ分類する版（classify_charts と同じルール。履歴の再計算などで使う） ---
+def chart_status(raw_name, expert, challenge):
+    """見つかった譜面の判定から "revenge" / "cleared" / "unplayed" を返す"""
+    e, c = lamps.parse(expert), lamps.parse(challenge)
+    # 難易度判定: 鬼→CHALLENGE, 激→EXPERT, どちらも無ければ両方見る
+    if "(鬼)" in raw_name:
+        targets = [c]
+    elif "(激)" in raw_name:
+        targets = [e]
+    else:
+        targets = [e, c]
+
+    if any(t == lamps.Lamp.FAILED for t in targets):
+        return "revenge"
+    if all(t >= lamps.Lamp.CLEAR for t in targets):
+        return "cleared"
+    return "unplayed"
+
+
+def analyze_level(level, df_wiki=None, df_my=None):
+    """1レベル分を分類してdatastoreに保存し、件数・曲名リスト・処理時間をdictで返す"""
+    start = time.perf_counter()
+
+    # 1. データ読み込み（渡されていなければdatastoreから）
+    with tracing.span("load", level=level):
+        if df_wiki is None:
+            df_wiki = datastore.load_charts(level)
+        if df_my is None:
+            df_my = datastore.load_scores(level)
+
+    # 2. 曲名の揺れを吸収（手動の対応付けを優先し、残りはあいまい照合）
+    #    指紋は datastore のキャッシュから引く（前回までに見た曲名は正規化し直さない）
+    with tracing.span("resolve_aliases", level=level):
+        aliases, matches = resolve_aliases(
+            df_wiki, df_my, datastore.load_title_overrides(), fingerprint=datastore.fingerprints
+        )
+
+    # 3. 全曲チェック
+    with tracing.span("classify", level=level):
+        revenge_list, unplayed_list = classify_charts(df_wiki, df_my, aliases, fingerprint=datastore.fingerprints)
+
+    # 4. 保存（リベンジ/未プレイ一覧は status で引く）
+    with tracing.span("save_status", level=level):
+        datastore.set_chart_status(level, revenge_list, unplayed_list)
+
+    total = len(df_wiki)
+    return {
+        "level": level,
+        "total": total,
+        "cleared": total - len(revenge_list) - len(unplayed_list),
+        "revenge": len(revenge_list),
+        "unplayed": len(unplayed_list),
+        "revenge_list": revenge_list,
+        "unplayed_list": unplayed_list,
+        "matches": matches,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def run_analysis(levels=None, wiki_frames=None, progress=None):
+    """指定レベルを順に分析する。曲リストかスコアが無いレベルはスキップ。
+    progress(phase, detail, current, total) を渡すとレベルごとに通知する。
+    工程ごとの処理時間は tracing に "analyze" として記録される"""
+    levels = lv.parse_levels(levels)
+    with tracing.run("analyze", levels=levels):
+        return _run_analysis(levels, wiki_frames or {}, progress)
+
+
+def _run_analysis(levels, wiki_frames, progress):
+    start = time.perf_counter()
+
+    results = {}
+    skipped = []
+    for i, level in enumerate(levels):
+        if progress:
+            progress("analyze", f"Lv{level}", i, len(levels))
+        has_wiki = level in wiki_frames or datastore.has_data("charts", level)
+        if not has_wiki or not datastore.has_data("scores", level):
+            skipped.append(level)
+            continue
+        results[level] = analyze_level(level, df_wiki=wiki_frames.get(level))
+
+    if not results:
+        raise FileNotFoundError(f"分析できるレベルがありません (データ未取得: Lv{', Lv'.join(map(str, skipped))})")
+
+    summary = {key: sum(r[key] for r in results.values()) for key in ("total", "cleared", "revenge", "unplayed")}
+    return {**summary, "levels": results, "skipped": skipped, "elapsed": time.perf_counter() - start}
+
+
+def main(argv=None):
+    # 例: python extract_lv18_separate.py 17 18 / python extract_lv18_separate.py all
+    print(f"参照先: {base_dir}")
+    print("記号・空白を全て無視して照合します...")
+
+    try:
+        result = run_analysis(sys.argv[1:] if argv is None else argv)
+
+        for level, r in result["levels"].items():
+            print(f"[Lv{level}]")
+            for m in r["matches"]:
+                mark = "採用" if m["accepted"] else "不採用"
+                source = "手動" if m["source"] == "override" else f"一致度 {m['confidence']:.2f}"
+                print(f"曲名の対応付け ({mark}, {source}): {m['title']} -> {m['match']}")
+            if r["revenge"]:
+                print(f"リベンジリスト: {r['revenge']}曲")
+
+            if r["unplayed"]:
+                print(f"未プレイリスト: {r['unplayed']}曲（ここに入っている曲を確認してください）")
+                if r["unplayed"] < 10:
+                     print("※ 残りわずかなので、具体的に表示します:")
+                     print(pd.DataFrame(r["unplayed_list"]))
+
+    except Exception as e:
+        print(f"エラー: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer, UnicodeDammit
+
+import lamps
+
+# 高速なlxmlがあれば使い、無ければBeautifulSoup(html.parser)で解析する
+try:
+    import lxml.html
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+DEFAULT_BACKEND = "lxml" if HAS_LXML else "bs4"
+
+# スコア一覧の表の id。行が0件でもこの表があれば「一覧の終わり」、無ければログイン画面やメンテナンス画面
+SCORE_TABLE_ID = "data_tbl"
+BACKENDS = ("lxml", "bs4") if HAS_LXML else ("bs4",)
+
+
+def _check_backend(backend):
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"使用できないパーサーです: {backend} (利用可能: {', '.join(BACKENDS)})")
+    return backend
+
+
+# --- 判定欄の画像から判定文字列へ、スコア欄の文字からスコアへ ---
+def _status_from_images(srcs):
+    return lamps.LABELS[lamps.from_images(srcs)]
+
+
+def _score_from_text(text):
+    digits = re.sub(r"\D", "", text or "")
+    return int(digits) if digits else None
+
+
+# ==========================================
+# lxml 版
+# ==========================================
+if HAS_LXML:
+    _CLASS = 'contains(concat(" ", normalize-space(@class), " "), " {} ")'
+    _X_SCORE_ROWS = etree.XPath(f'//tr[{_CLASS.format("data")}]')
+    _X_TITLE = etree.XPath(f'.//div[{_CLASS.format("music_tit")}]')
+    _X_LINK = etree.XPath('.//a')
+    _X_DIFF = etree.XPath('.//td[@id=$diff_id]')
+    _X_IMG = etree.XPath('.//img')
+    _X_SCORE = etree.XPath(f'.//*[{_CLASS.format("data_score")}]')
+    _X_SCORE_TABLE = etree.XPath('//table[@id=$table_id]')
+    _X_WORKOUT_ROWS = etree.XPath('//table[@id="work_out_left"]//tr')
+    _X_WORKOUT_TABLE = etree.XPath('//table[@id="work_out_left"]')
+    _X_WIKIBODY = etree.XPath('//div[@id="wikibody"]')
+    _X_ROWS = etree.XPath('.//tr')
+    _X_CELLS = etree.XPath('.//td')
+
+    def _lxml_doc(html):
+        # バイト列は BeautifulSoup と同じ方法で文字コードを判定してから渡す
+        if isinstance(html, bytes):
+            html = UnicodeDammit(html, is_html=True).unicode_markup or ""
+        if not html.strip():
+            return lxml.html.fromstring("<html></html>")
+        # encoding宣言付きのHTMLでもエラーにならないよう、UTF-8のバイト列で渡す
+        return lxml.html.fromstring(html.encode("utf-8"), parser=lxml.html.HTMLParser(encoding="utf-8"))
+
+    def _lxml_status(row, diff_id):
+        """(判定, スコア)"""
+        td = _X_DIFF(row, diff_id=diff_id)
+        if not td: return lamps.LABELS[lamps.Lamp.NO_DATA], None
+        score = _X_SCORE(td[0])
+        return (_status_from_images([img.get('src', '') for img in _X_IMG(td[0])]),
+                _score_from_text(score[0].text_content()) if score else None)
+
+    def _lxml_score_rows(html):
+        result = []
+        for row in _X_SCORE_ROWS(_lxml_doc(html)):
+            title = _X_TITLE(row) or _X_LINK(row)
+            song_name = title[0].text_content().strip()
+            (expert, expert_score), (challenge, challenge_score) = _lxml_status(row, 'expert'), _lxml_status(row, 'challenge')
+            result.append([song_name, expert, challenge, expert_score, challenge_score])
+        return result
+
+    def _lxml_is_score_page(html):
+        return bool(_X_SCORE_TABLE(_lxml_doc(html), table_id=SCORE_TABLE_ID))
+
+    def _lxml_workout_rows(html):
+        doc = _lxml_doc(html)
+        if not _X_WORKOUT_TABLE(doc):
+            return None
+        return [[td.text_content() for td in _X_CELLS(row)] for row in _X_WORKOUT_ROWS(doc)]
+
+    def _lxml_wiki_songs(html):
+        body = _X_WIKIBODY(_lxml_doc(html))
+        if not body:
+            raise ValueError("wikibody が見つかりません")
+        songs = []
+        for row in _X_ROWS(body[0]):
+            cells = _X_CELLS(row)
+            if not cells:
+                continue
+            link = _X_LINK(cells[0])
+            if link:
+                songs.append(link[0].text_content().strip())
+        return songs
+
+
+# ==========================================
+# BeautifulSoup 版（フォールバック）
+# ==========================================
+def _bs4_status(row, diff_id):
+    """(判定, スコア)"""
+    td = row.find('td', id=diff_id)
+    if not td: return lamps.LABELS[lamps.Lamp.NO_DATA], None
+    score = td.find(class_='data_score')
+    return (_status_from_images([img.get('src', '') for img in td.find_all('img')]),
+            _score_from_text(score.text) if score else None)
+
+
+def _bs4_score_rows(html):
+    # スコア表の行だけを木にする
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('tr', class_='data'))
+    result = []
+    for row in soup.find_all('tr', class_='data'):
+        title_div = row.find('div', class_='music_tit')
+        song_name = title_div.text.strip() if title_div else row.find('a').text.strip()
+        (expert, expert_score), (challenge, challenge_score) = _bs4_status(row, 'expert'), _bs4_status(row, 'challenge')
+        result.append([song_name, expert, challenge, expert_score, challenge_score])
+    return result
+
+
+def _bs4_is_score_page(html):
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('table', id=SCORE_TABLE_ID))
+    return soup.find('table', id=SCORE_TABLE_ID) is not None
+
+
+def _bs4_workout_rows(html):
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('table', id='work_out_left'))
+    table = soup.find('table', id='work_out_left')
+    if not table:
+        return None
+    return [[td.text for td in row.find_all('td')] for row in table.find_all('tr')]
+
+
+def _bs4_wiki_songs(html):
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('div', id='wikibody'))
+    main_content = soup.find('div', id='wikibody')
+    if not main_content:
+        raise ValueError("wikibody が見つかりません")
+    songs = []
+    for row in main_content.find_all('tr'):
+        cells = row.find_all('td')
+        if not cells:
+            continue
+        link_tag = cells[0].find('a')
+        if link_tag:
+            songs.append(link_tag.text.strip())
+    return songs
+
+
+# ==========================================
+# 公開関数
+# ==========================================
+def parse_score_rows(html, backend=None):
+    """スコア一覧ページから [曲名, EXPERT判定, CHALLENGE判定, EXPERTスコア, CHALLENGEスコア] のリストを返す。
+    判定は lamps.LABELS の文字列、スコアは display=score のページで表示される点数（無ければ None）"""
+    if _check_backend(backend) == "lxml":
+        return _lxml_score_rows(html)
+    return _bs4_score_rows(html)
+
+
+def is_score_page(html, backend=None):
+    """スコア一覧のページか（行が0件の最終ページの次も True。ログイン画面などは False）"""
+    if _check_backend(backend) == "lxml":
+        return _lxml_is_score_page(html)
+    return _bs4_is_score_page(html)
+
+
+def parse_workout_rows(html, backend=None):
+    """work_out_left テーブルの各行のセル文字列リストを返す（テーブルが無ければ None）"""
+    if _check_backend(backend) == "lxml":
+        return _lxml_workout_rows(html)
+    return _bs4_workout_rows(html)
+
+
+def parse_wiki_songs(html, backend=None):
+    """AtWiki本文の表から、各行1つ目のセルのリンク文字列（曲名）を返す"""
+    if _check_backend(backend) == "lxml":
+        return _lxml_wiki_songs(html)
+    return _bs4_wiki_songs(html)
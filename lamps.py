@@ -0,0 +1,98 @@
+import os
+from enum import IntEnum
+
+import numpy as np
+import pandas as pd
+
+# 1譜面の判定（クリアランプ）。スクレイパーで1回だけ読み取り、以降は int8 の番号で扱う。
+# 番号が大きいほど良い判定（CLEAR 以上がクリア済み）。保存する文字列は LABELS で、
+# フルコンボ系も「クリア済み(…)」で始まるので、文字列で判定していた頃のデータとも互換がある
+
+
+class Lamp(IntEnum):
+    NO_DATA = 0   # その難易度の譜面が無い
+    NO_PLAY = 1
+    FAILED = 2    # 判定画像が rank_s_e（E判定 = 未クリア）
+    CLEAR = 3
+    LIFE4 = 4
+    FC = 5        # グッドフルコンボ
+    GFC = 6
+    PFC = 7
+    MFC = 8
+
+
+LABELS = {
+    Lamp.NO_DATA: "データなし",
+    Lamp.NO_PLAY: "未プレイ",
+    Lamp.FAILED: "未クリア(E)",
+    Lamp.CLEAR: "クリア済み",
+    Lamp.LIFE4: "クリア済み(LIFE4)",
+    Lamp.FC: "クリア済み(FC)",
+    Lamp.GFC: "クリア済み(GFC)",
+    Lamp.PFC: "クリア済み(PFC)",
+    Lamp.MFC: "クリア済み(MFC)",
+}
+# 判定列の型（カテゴリの並び = 番号）
+DTYPE = pd.CategoricalDtype(list(LABELS.values()), ordered=True)
+
+# ==========================================
+# 設定エリア（公式サイトの画像ファイル名の手がかり）
+# ==========================================
+FAILED_IMAGE = "rank_s_e"
+# クリアの種類の画像（ファイル名にこの文字列を含むもの。上から順に調べる）
+CLEAR_KIND_IMAGES = (
+    ("marv", Lamp.MFC),
+    ("perf", Lamp.PFC),
+    ("great", Lamp.GFC),
+    ("good", Lamp.FC),
+    ("life4", Lamp.LIFE4),
+)
+# ==========================================
+
+_BY_LABEL = {label: lamp for lamp, label in LABELS.items()}
+
+
+def from_images(srcs):
+    """判定欄の画像の src の並びから判定を読む（画像が無ければ未プレイ）"""
+    names = [os.path.basename(src or "") for src in srcs]
+    if not names:
+        return Lamp.NO_PLAY
+    if any(FAILED_IMAGE in name for name in names):
+        return Lamp.FAILED
+    for marker, lamp in CLEAR_KIND_IMAGES:
+        if any(marker in name and not name.startswith("rank_") for name in names):
+            return lamp
+    return Lamp.CLEAR
+
+
+def parse(value):
+    """保存された判定の文字列を Lamp にする（旧形式の文字列も部分一致で読む）"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return Lamp.NO_DATA
+    value = str(value)
+    lamp = _BY_LABEL.get(value)
+    if lamp is not None:
+        return lamp
+    if "未クリア" in value:
+        return Lamp.FAILED
+    if "クリア済み" in value:
+        return Lamp.CLEAR
+    if "未プレイ" in value:
+        return Lamp.NO_PLAY
+    return Lamp.NO_DATA
+
+
+def codes(values):
+    """判定の列を int8 の番号の配列にする（文字列の解析は種類ごとに1回だけ）"""
+    if isinstance(values, pd.Series) and values.dtype == DTYPE:
+        return values.cat.codes.to_numpy(dtype=np.int8, copy=True).clip(min=Lamp.NO_DATA)
+    inverse, uniques = pd.factorize(pd.Series(values, dtype=object))
+    # factorize は欠損を -1 にするので、末尾の NO_DATA を引かせる
+    table = np.array([parse(u) for u in uniques] + [Lamp.NO_DATA], dtype=np.int8)
+    return table[inverse]
+
+
+def categorical(values):
+    """判定の列をカテゴリ型（DTYPE）の Series にする"""
+    index = values.index if isinstance(values, pd.Series) else None
+    return pd.Series(pd.Categorical.from_codes(codes(values), dtype=DTYPE), index=index)
@@ -0,0 +1,65 @@
+import os
+
+# ==========================================
+# レベル別のファイル配置
+# ==========================================
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+ALL_LEVELS = tuple(range(1, 20))   # Lv1〜Lv19
+DEFAULT_LEVEL = 18
+
+# AtWikiのレベル別曲リストページ（分かっているものだけ。追加すればそのレベルも取得される）
+WIKI_PAGES = {
+    18: "https://w.atwiki.jp/asigami/pages/19.html",
+}
+# 画面で選べるレベル（全曲数はWikiの曲リストから出すので、URLが登録済みのものだけ）
+WIKI_LEVELS = tuple(sorted(WIKI_PAGES))
+
+# 公式スコア一覧（filtertype がレベル、offset がページ番号）
+URL_SCORE_PAGE = "https://p.eagate.573.jp/game/ddr/ddrworld/playdata/music_data_single.html?offset={offset}&filter=2&filtertype={level}&display=score"
+
+
+# --- 旧CSVファイル（datastoreへの初回取り込み用） ---
+def wiki_file(level):
+    return os.path.join(base_dir, f"DDR{level}_songs.csv")
+
+
+def score_file(level):
+    return os.path.join(base_dir, f"my_ddr_data_lv{level}.csv")
+
+
+def revenge_file(level):
+    return os.path.join(base_dir, f"lv{level}_revenge.csv")
+
+
+def unplayed_file(level):
+    return os.path.join(base_dir, f"lv{level}_unplayed.csv")
+
+
+def score_url_template(level):
+    # {offset} だけを残したURLテンプレート
+    return URL_SCORE_PAGE.replace("{level}", str(level))
+
+
+def parse_levels(values):
+    """"18", "17-19", "all" などの指定をレベルのタプルにする（重複なし・昇順）"""
+    if not values:
+        return (DEFAULT_LEVEL,)
+    if isinstance(values, (int, str)):
+        values = [values]
+
+    result = set()
+    for value in values:
+        text = str(value).strip().lower()
+        if text == "all":
+            result.update(ALL_LEVELS)
+        elif "-" in text:
+            low, high = (int(v) for v in text.split("-", 1))
+            result.update(range(low, high + 1))
+        else:
+            result.add(int(text))
+
+    invalid = sorted(result - set(ALL_LEVELS))
+    if invalid:
+        raise ValueError(f"対応していないレベルです: {invalid}")
+    return tuple(sorted(result))
@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+import zipfile
+
+import html_parser
+
+# 取得したページの記録と再生（ブラウザもログインも無しで、解析と保存の処理だけを動かす）
+#   記録: python scrape_official_ddr.py 18 --record lv18   -> fixtures/lv18.zip
+#   再生: python scrape_official_ddr.py 18 --replay lv18   (同じ解析・保存の処理に記録したページを流す。保存先は fixtures/lv18.sqlite3)
+# アーカイブはzip（deflate圧縮）。manifest.json に URL -> ページのファイル名 の対応を入れる
+
+# ==========================================
+# 設定エリア
+# ==========================================
+base_dir = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(base_dir, "fixtures")   # 名前だけ指定したときの置き場所（本人のスコアが入るのでgit管理外）
+# ==========================================
+
+# 一覧の終わりを表す行の無いページ（ブラウザの巡回で記録したとき、最後のページの次の offset に入れる）
+END_PAGE = f'<html><body><table id="{html_parser.SCORE_TABLE_ID}"></table></body></html>'
+
+
+def fixture_path(name):
+    """"lv18" のような名前なら FIXTURE_DIR/lv18.zip、パスならそのまま"""
+    if os.path.dirname(name) or name.endswith(".zip"):
+        return name
+    return os.path.join(FIXTURE_DIR, f"{name}.zip")
+
+
+class FixtureMissing(LookupError):
+    """記録に無いページを再生しようとした"""
+
+
+# --- 記録 ---
+class Recorder:
+    """取得したページを URL ごとに覚え、save() で1つのアーカイブに書き出す（複数スレッドから add してよい）"""
+
+    def __init__(self, name):
+        self.path = fixture_path(name)
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._pages)
+
+    def add(self, url, content):
+        data = content.encode("utf-8") if isinstance(content, str) else bytes(content)
+        with self._lock:
+            self._pages[url] = data
+
+    def wrap(self, session):
+        """requests.Session の代わりに使うと、GETで取れたページを記録する"""
+        return RecordingSession(session, self)
+
+    def save(self):
+        """アーカイブを書き出してパスを返す（一時ファイルに書いてから置き換える）"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock:
+            pages = dict(self._pages)
+        manifest = {
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "pages": {url: f"pages/{i:04d}.html" for i, url in enumerate(sorted(pages))},
+        }
+        tmp = self.path + ".tmp"
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+            for url, member in manifest["pages"].items():
+                archive.writestr(member, pages[url])
+        os.replace(tmp, self.path)
+        return self.path
+
+
+class RecordingSession:
+    def __init__(self, session, recorder):
+        self._session = session
+        self._recorder = recorder
+
+    def get(self, url, **kwargs):
+        response = self._session.get(url, **kwargs)
+        if response.status_code == 200:
+            self._recorder.add(url, response.content)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+# --- 再生 ---
+class Fixture:
+    """記録したアーカイブ。開いたときに全ページをメモリに読み込む"""
+
+    def __init__(self, name):
+        self.path = fixture_path(name)
+        with zipfile.ZipFile(self.path) as archive:
+            manifest = json.loads(archive.read("manifest.json"))
+            self.recorded_at = manifest.get("recorded_at")
+            self._pages = {url: archive.read(member) for url, member in manifest["pages"].items()}
+
+    def __len__(self):
+        return len(self._pages)
+
+    def __contains__(self, url):
+        return url in self._pages
+
+    def urls(self):
+        return list(self._pages)
+
+    def get(self, url):
+        try:
+            return self._pages[url]
+        except KeyError:
+            raise FixtureMissing(f"記録に無いページです: {url} ({self.path})") from None
+
+    def scratch_db(self):
+        """再生した結果の保存先（アーカイブの隣の .sqlite3）。本物のDBのスコアや履歴は書き換えない"""
+        return os.path.splitext(self.path)[0] + ".sqlite3"
+
+    def session(self):
+        """requests.Session の代わりに使える、記録したページを返すだけのセッション"""
+        return ReplaySession(self)
+
+
+class ReplayResponse:
+    def __init__(self, url, content):
+        self.url = url
+        self.content = content if content is not None else b""
+        self.status_code = 200 if content is not None else 404
+        self.headers = {}
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if self.status_code != 200:
+            raise FixtureMissing(f"記録に無いページです: {self.url}")
+
+
+class ReplaySession:
+    def __init__(self, fixture):
+        self.fixture = fixture
+
+    def get(self, url, **kwargs):
+        return ReplayResponse(url, self.fixture.get(url) if url in self.fixture else None)
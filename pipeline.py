@@ -0,0 +1,269 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import closing
+from datetime import datetime
+
+import data_manager
+import datastore
+import levels as lv
+import players
+import title_normalize
+
+# 使い方: python pipeline.py 18                     (Wiki取得と公式取得を並列に実行し、入力が変わったレベルだけ分析)
+#         python pipeline.py all --stages wiki analyze --out summary.json
+#         python pipeline.py 18 --official-interval 20  (前回の公式取得から20時間以内なら公式取得を飛ばす。cron用)
+# 画面を開かずに更新するための入口。進み具合は標準エラーに出し、最後に結果のJSONを標準出力に出す
+
+# ==========================================
+# 設定エリア
+# ==========================================
+base_dir = os.path.dirname(os.path.abspath(__file__))
+STATE_DIR = os.path.join(base_dir, ".pipeline")
+STATE_FILE = os.path.join(STATE_DIR, "state.json")   # 工程ごとの前回の入力・成功日時
+# ==========================================
+
+
+# --- 前回の実行記録 ---
+def load_state():
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, STATE_FILE)
+
+
+def analysis_inputs(level, path=None):
+    """分析の入力（曲リスト・スコア・手動対応付け・指紋の作り方）のハッシュ。これが同じなら分析結果も同じ"""
+    digest = hashlib.sha256(f"fingerprint:{title_normalize.FINGERPRINT_VERSION}\n".encode("utf-8"))
+    queries = (
+        ("SELECT title FROM charts WHERE level = ? ORDER BY position", (level,)),
+        ("SELECT title, difficulty, status FROM scores WHERE level = ? ORDER BY position, difficulty", (level,)),
+        ("SELECT title, official_title FROM title_overrides ORDER BY title", ()),
+    )
+    with closing(datastore.connect(path)) as conn:
+        for sql, params in queries:
+            digest.update(b"--\n")
+            for row in conn.execute(sql, params):
+                digest.update(json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+# ==========================================
+# 工程の定義（依存関係つき）
+# ==========================================
+class Stage:
+    """func(context) は {"status": "ok" / "unchanged" / "skipped" / "failed", ...} を返す"""
+
+    def __init__(self, name, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+def run_stages(stages, context, max_workers=2):
+    """依存する工程が全て終わった工程から順に実行する（依存の無い工程どうしは並列）。
+    依存先が失敗した工程は実行せず "skipped" にする。{工程名: 結果} を返す"""
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        unknown = set(stage.deps) - names
+        if unknown:
+            raise ValueError(f"{stage.name}: 未定義の工程に依存しています: {sorted(unknown)}")
+
+    results = {}
+    pending = list(stages)
+    running = {}
+
+    def start(pool, stage):
+        def timed():
+            begin = time.perf_counter()
+            try:
+                result = stage.func(context)
+            except Exception as exc:
+                result = {"status": "failed", "error": str(exc)}
+            result["elapsed"] = round(time.perf_counter() - begin, 3)
+            return result
+        running[pool.submit(timed)] = stage
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline") as pool:
+        while pending or running:
+            for stage in [s for s in pending if all(d in results for d in s.deps)]:
+                pending.remove(stage)
+                failed = [d for d in stage.deps if results[d]["status"] == "failed"]
+                if failed:
+                    results[stage.name] = {"status": "skipped", "reason": f"依存する工程が失敗: {', '.join(failed)}"}
+                else:
+                    _log(f"[{stage.name}] 開始")
+                    start(pool, stage)
+            if not running:
+                if pending:
+                    raise ValueError(f"依存関係が循環しています: {[s.name for s in pending]}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                results[stage.name] = future.result()
+                _log(f"[{stage.name}] {results[stage.name]['status']} ({results[stage.name]['elapsed']}秒)")
+    return results
+
+
+_log_lock = threading.Lock()
+
+
+def _log(message):
+    with _log_lock:
+        print(message, file=sys.stderr, flush=True)
+
+
+def _progress(stage):
+    # data_manager のジョブと同じ progress(phase, detail, current, total) を標準エラーに出す
+    def report(phase, detail="", current=None, total=None):
+        count = f" ({current}/{total})" if current is not None and total else ""
+        _log(f"[{stage}] {data_manager.PHASE_LABELS.get(phase, phase)}: {detail}{count}")
+    return report
+
+
+# --- 各工程 ---
+def wiki_stage(context):
+    res = data_manager.update_wiki_data(context["levels"], offline=context["offline"], progress=_progress("wiki"))
+    if not res["ok"]:
+        return {"status": "failed", "error": res["message"]}
+    data = res["data"]
+    return {
+        "status": data.get("status", "ok"),   # 曲リストが前回と同じなら "unchanged"
+        "changed": data.get("changed", []),
+        "unchanged": data.get("unchanged", []),
+        "skipped_levels": data.get("skipped", []),
+    }
+
+
+def official_stage(context):
+    state = context["state"].setdefault("official", {})
+    key = context["player"]
+    last = state.get(key)
+    interval = context["official_interval"]
+    if not context["force"] and interval and last and time.time() - last < interval * 3600:
+        return {"status": "skipped", "reason": f"前回の取得から{interval}時間以内",
+                "last_success": datetime.fromtimestamp(last).isoformat(timespec="seconds")}
+
+    res = data_manager.update_official_data(context["levels"], progress=_progress("official"), player=context["player"])
+    if not res["ok"]:
+        return {"status": "failed", "error": res["message"]}
+    with context["lock"]:
+        state[key] = time.time()
+    data = res["data"]
+    return {"status": "ok", "scores": data.get("scores"), "pages": data.get("pages"), "workouts": data.get("workouts")}
+
+
+def analyze_stage(context):
+    if context["player"] != players.DEFAULT_PLAYER:
+        # 既定以外のプレイヤーの一覧は画面表示時に players が分類するので、保存する分析結果は無い
+        return {"status": "skipped", "reason": "既定以外のプレイヤーは画面表示時に分類します"}
+
+    previous = context["state"].setdefault("analyze", {})
+    targets, unchanged, missing = [], [], []
+    digests = {}
+    for level in context["levels"]:
+        if not datastore.has_data("charts", level) or not datastore.has_data("scores", level):
+            missing.append(level)
+            continue
+        digests[level] = analysis_inputs(level)
+        if not context["force"] and previous.get(str(level)) == digests[level]:
+            unchanged.append(level)
+        else:
+            targets.append(level)
+
+    result = {"analyzed": targets, "unchanged": unchanged, "missing": missing}
+    if not targets:
+        return {"status": "unchanged" if unchanged else "skipped", **result}
+
+    res = data_manager.analyze_data(targets, progress=_progress("analyze"))
+    if not res["ok"]:
+        return {"status": "failed", "error": res["message"], **result}
+    with context["lock"]:
+        previous.update({str(level): digests[level] for level in targets})
+    data = res["data"]
+    return {"status": "ok", **result, **{k: data.get(k) for k in ("total", "cleared", "revenge", "unplayed")}}
+
+
+STAGES = {
+    "wiki": Stage("wiki", wiki_stage),
+    "official": Stage("official", official_stage),
+    "analyze": Stage("analyze", analyze_stage, deps=("wiki", "official")),
+}
+
+
+def run_pipeline(levels=None, stages=None, player=None, offline=False, official_interval=0, force=False):
+    """指定した工程を依存関係の順に実行し、結果のdictを返す（stages 省略時は全工程）"""
+    levels = lv.parse_levels(levels)
+    player = players.normalize_player(player)
+    selected = list(stages or STAGES)
+    unknown = [name for name in selected if name not in STAGES]
+    if unknown:
+        raise ValueError(f"不明な工程です: {unknown}")
+    # 選ばなかった工程への依存は「済み」とみなす
+    chosen = [Stage(name, STAGES[name].func, [d for d in STAGES[name].deps if d in selected]) for name in selected]
+
+    state = load_state()
+    context = {
+        "levels": levels, "player": player, "offline": offline, "official_interval": official_interval,
+        "force": force, "state": state, "lock": threading.Lock(),
+    }
+    start = time.time()
+    results = run_stages(chosen, context)
+    save_state(state)
+    return {
+        "ok": all(r["status"] != "failed" for r in results.values()),
+        "started": datetime.fromtimestamp(start).isoformat(timespec="seconds"),
+        "elapsed": round(time.time() - start, 3),
+        "levels": list(levels),
+        "player": player,
+        "stages": {name: results[name] for name in selected},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wiki取得・公式取得・分析を画面なしで実行する")
+    parser.add_argument("levels", nargs="*", help='例: 18 / 17-19 / all（省略時は既定のレベル）')
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), help="実行する工程（省略時は全て）")
+    parser.add_argument("--player", help="公式データを取得するプレイヤー（省略時は既定のプレイヤー）")
+    parser.add_argument("--offline", action="store_true", help="Wikiは取得せず、控えておいたHTMLを解析し直す")
+    parser.add_argument("--official-interval", type=float, default=0,
+                        help="前回の公式取得からこの時間（時間単位）以内なら公式取得を飛ばす")
+    parser.add_argument("--force", action="store_true", help="入力が変わっていなくても全工程を実行する")
+    parser.add_argument("--out", help="結果のJSONをこのファイルにも保存する")
+    args = parser.parse_args(argv)
+
+    # スクレイパーの print は標準エラーへ（標準出力は結果のJSONだけにする）
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            summary = run_pipeline(args.levels, args.stages, args.player, args.offline,
+                                   args.official_interval, args.force)
+    except ValueError as e:
+        parser.error(str(e))
+
+    text = json.dumps(summary, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0 if summary["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
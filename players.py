@@ -0,0 +1,185 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import datastore
+import title_normalize
+from extract_lv18_separate import classify_charts, resolve_aliases
+
+# ==========================================
+# 設定エリア
+# ==========================================
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 1つの画面を複数のプレイヤーで使う:
+#   Wikiの曲リスト（カタログ）と曲名の手動対応付けは全員で共有（datastore.DB_FILE）
+#   スコア・ワークアウト・クロール履歴はプレイヤーごとのDB（既定のプレイヤーは datastore.DB_FILE のまま）
+PLAYERS_DIR = os.path.join(base_dir, "players")
+DEFAULT_PLAYER = "default"
+PLAYER_NAME = re.compile(r"^[A-Za-z0-9_-]{1,32}$")   # ファイル名にそのまま使うので英数字と - _ だけ
+
+MAX_CACHED_LISTS = 32   # リベンジ/未プレイ一覧を覚えておく (プレイヤー, レベル) の数。超えたら古いものから捨てる
+# ==========================================
+
+
+# --- プレイヤー名と保存先 ---
+def normalize_player(player):
+    """None や空文字は既定のプレイヤー。使えない名前なら ValueError"""
+    player = (player or DEFAULT_PLAYER).strip()
+    if not PLAYER_NAME.match(player):
+        raise ValueError(f"プレイヤー名には英数字と - _ だけが使えます (32文字まで): {player}")
+    return player
+
+
+def db_path(player=None):
+    player = normalize_player(player)
+    if player == DEFAULT_PLAYER:
+        return datastore.DB_FILE
+    return os.path.join(PLAYERS_DIR, f"{player}.sqlite3")
+
+
+def session_name(base, player=None):
+    """browser_session のプロフィール名（プレイヤーごとに別のログイン状態を持つ）"""
+    player = normalize_player(player)
+    return base if player == DEFAULT_PLAYER else f"{base}-{player}"
+
+
+def list_players():
+    names = []
+    if os.path.isdir(PLAYERS_DIR):
+        names = sorted(
+            name[:-len(".sqlite3")] for name in os.listdir(PLAYERS_DIR)
+            if name.endswith(".sqlite3") and PLAYER_NAME.match(name[:-len(".sqlite3")])
+        )
+    return [DEFAULT_PLAYER, *(n for n in names if n != DEFAULT_PLAYER)]
+
+
+def create_player(player):
+    """プレイヤーのDBを作る（すでにあれば何もしない）。正規化したプレイヤー名を返す"""
+    player = normalize_player(player)
+    os.makedirs(PLAYERS_DIR, exist_ok=True)
+    datastore.connect(db_path(player)).close()
+    return player
+
+
+def revision(player=None):
+    """(共有DBの更新番号, プレイヤーのDBの更新番号)。画面のキャッシュキー用"""
+    path = db_path(player)
+    shared = datastore.revision()
+    return shared, shared if path == datastore.DB_FILE else datastore.revision(path)
+
+
+# --- 共有の曲リスト（レベルごとにプロセスで1回だけ読み込み、曲リストが変わったときだけ読み直す） ---
+class Catalog:
+    """1レベル分のWikiの曲リスト（指紋は分類のときに title_normalize のプロセス内キャッシュから引く）"""
+
+    def __init__(self, level, charts_revision):
+        self.level = level
+        self.revision = charts_revision
+        self.charts = datastore.load_charts(level)
+
+    def __len__(self):
+        return len(self.charts)
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def catalog(level):
+    charts_revision = datastore.revision(key="charts_revision")
+    with _catalogs_lock:
+        cached = _catalogs.get(level)
+        if cached is None or cached.revision != charts_revision:
+            cached = _catalogs[level] = Catalog(level, charts_revision)
+        return cached
+
+
+# --- プレイヤーごとのリベンジ/未プレイ一覧（必要になったときに分類し、件数上限付きのLRUで覚える） ---
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def discard(self, match):
+        """match(key) が真のものを捨てる"""
+        with self._lock:
+            for key in [k for k in self._items if match(k)]:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_lists = LRUCache(MAX_CACHED_LISTS)
+
+
+def chart_lists(player, level):
+    """{"revenge": [譜面名...], "unplayed": [譜面名...], "total": 全譜面数} を返す。
+    曲リスト・手動対応付け・プレイヤーのスコアのどれかが変わるまでは分類し直さない"""
+    player = normalize_player(player)
+    key = (player, level, revision(player))
+    result = _lists.get(key)
+    if result is not None:
+        return result
+
+    shared = catalog(level)
+    df_my = datastore.load_scores(level, db_path(player))
+    if df_my.empty:
+        # スコアが無ければ全曲が未プレイ
+        revenge, unplayed = [], shared.charts["曲名"].map(lambda v: str(v).strip()).tolist()
+    else:
+        aliases, _ = resolve_aliases(shared.charts, df_my, datastore.load_title_overrides(),
+                                     fingerprint=title_normalize.fingerprints)
+        revenge, unplayed = classify_charts(shared.charts, df_my, aliases, fingerprint=title_normalize.fingerprints)
+
+    result = {"revenge": revenge, "unplayed": unplayed, "total": len(shared)}
+    # 同じ (プレイヤー, レベル) の古い結果はもう使わないので先に捨てる
+    _lists.discard(lambda k: k[:2] == (player, level))
+    _lists.put(key, result)
+    return result
+
+
+def load_revenge(level, player=None):
+    return pd.DataFrame({"曲名": chart_lists(player, level)["revenge"]}, dtype=object)
+
+
+def load_unplayed(level, player=None):
+    return pd.DataFrame({"未プレイ曲名": chart_lists(player, level)["unplayed"]}, dtype=object)
+
+
+def load(kind, level=None, player=None):
+    """datastore.load と同じ種類名で、プレイヤーの分のデータを返す"""
+    if kind == "revenge":
+        return load_revenge(level, player)
+    if kind == "unplayed":
+        return load_unplayed(level, player)
+    if kind == "charts":
+        return catalog(level).charts.copy()
+    return datastore.load(kind, level, db_path(player))
+
+
+def export_csv(kind, level=None, player=None):
+    return load(kind, level, player).to_csv(index=False).encode("utf-8-sig")
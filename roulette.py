@@ -0,0 +1,108 @@
+import math
+import random
+
+import pandas as pd
+
+
+# --- Walkerのエイリアス法（Vose版）: 作成O(n)、1回の抽選O(1) ---
+def build_alias_table(weights):
+    n = len(weights)
+    total = float(sum(weights))
+    if n == 0 or total <= 0:
+        raise ValueError("抽選対象がありません")
+
+    prob = [w * n / total for w in weights]
+    alias = list(range(n))
+    small = [i for i, p in enumerate(prob) if p < 1.0]
+    large = [i for i, p in enumerate(prob) if p >= 1.0]
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        alias[s] = l
+        prob[l] -= 1.0 - prob[s]
+        (small if prob[l] < 1.0 else large).append(l)
+    for i in small + large:
+        prob[i] = 1.0
+    return prob, alias
+
+
+class Roulette:
+    """重み付きルーレット。一度出た曲は、全曲出し切るまで出ない。
+
+    抽選表はリストごとに1回だけ作り、st.session_state に置いて使い回す想定。
+    出た曲の重みが表全体の半分を超えたら、残りの曲だけで表を作り直す
+    （出た曲に当たったときの引き直しが平均2回以内に収まる）。
+    """
+
+    def __init__(self, items, weights=None, seed=None):
+        self.items = list(items)
+        self.weights = [1.0] * len(self.items) if weights is None else [max(float(w), 0.0) for w in weights]
+        if len(self.weights) != len(self.items):
+            raise ValueError("items と weights の数が違います")
+        self._rng = random.Random(seed)
+        self.round = 0
+        self._start_round()
+
+    def _start_round(self):
+        self.round += 1
+        self._drawn = set()
+        self._rebuild([i for i, w in enumerate(self.weights) if w > 0])
+        self._remaining = self._round_size = len(self._active)
+
+    def _rebuild(self, indices):
+        self._active = indices
+        self._active_weight = sum(self.weights[i] for i in indices)
+        self._drawn_weight = 0.0
+        self._prob, self._alias = build_alias_table([self.weights[i] for i in indices])
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def remaining(self):
+        return self._remaining
+
+    def _sample(self):
+        k = self._rng.randrange(len(self._active))
+        if self._rng.random() >= self._prob[k]:
+            k = self._alias[k]
+        return self._active[k]
+
+    def draw(self):
+        """1曲抽選する（このラウンドで出ていない曲から）"""
+        if self.remaining == 0:
+            self._start_round()
+
+        index = self._sample()
+        while index in self._drawn:
+            index = self._sample()
+        self._drawn.add(index)
+        self._remaining -= 1
+        self._drawn_weight += self.weights[index]
+
+        if self._remaining and self._drawn_weight * 2 >= self._active_weight:
+            self._rebuild([i for i in self._active if i not in self._drawn])
+        return self.items[index]
+
+    def draw_many(self, n):
+        """n曲のセットリストを作る。このラウンドの残りで足りなければ新しいラウンドから引くので、
+        n が抽選対象の曲数以下ならセットリストの中で同じ曲は出ない"""
+        if n > self.remaining and self.remaining < self._round_size:
+            self._start_round()
+        return [self.draw() for _ in range(n)]
+
+
+# --- ワークアウト実績から「目標カロリーに必要な曲数」を求める ---
+def songs_for_calories(df_calories, target_kcal):
+    """1曲あたりの平均消費カロリーから求める。列が無い・実績が0なら 0"""
+    if df_calories is None or df_calories.empty or target_kcal <= 0:
+        return 0
+    if not {"曲数", "消費カロリー"} <= set(df_calories.columns):
+        return 0
+    total_songs = pd.to_numeric(df_calories["曲数"], errors="coerce").sum()
+    if total_songs <= 0:
+        return 0
+    kcal_per_song = pd.to_numeric(df_calories["消費カロリー"], errors="coerce").sum() / total_songs
+    if kcal_per_song <= 0:
+        return 0
+    return math.ceil(target_kcal / kcal_per_song)
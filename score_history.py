@@ -0,0 +1,138 @@
+from collections import Counter
+
+import pandas as pd
+
+import datastore
+from extract_lv18_separate import chart_status, resolve_aliases
+
+# クロール履歴（datastore の crawls / score_changes）からの再構成
+# score_changes には前回から変わった譜面だけが入っているので、順番に適用すれば任意時点の状態になる
+
+
+def load_changes(level, until=None, path=None):
+    """履歴の差分を古い順に返す（until を指定するとその日時までのクロールだけ）"""
+    sql = """SELECT k.id AS crawl_id, k.crawled_at, c.title, c.difficulty, c.status
+             FROM crawls k LEFT JOIN score_changes c ON c.crawl_id = k.id
+             WHERE k.level = ?"""
+    params = [level]
+    if until is not None:
+        sql += " AND k.crawled_at <= ?"
+        params.append(pd.Timestamp(until).isoformat())
+    sql += " ORDER BY k.id"
+    with datastore.reader(path) as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+def state_at(level, when=None, path=None):
+    """指定日時時点のスコア（load_scores と同じ形: 曲名, EXPERT判定, CHALLENGE判定）"""
+    changes = load_changes(level, when, path).dropna(subset=["title"])
+    latest = changes.drop_duplicates(["title", "difficulty"], keep="last")
+    latest = latest[latest["status"].notna()]
+    if latest.empty:
+        return pd.DataFrame(columns=["曲名", *datastore.DIFFICULTIES.values()])
+    wide = latest.pivot(index="title", columns="difficulty", values="status")
+    wide = wide.reindex(columns=list(datastore.DIFFICULTIES)).rename(columns=datastore.DIFFICULTIES)
+    wide = wide.reset_index().rename(columns={"title": "曲名"})
+    wide.columns.name = None
+    return wide
+
+
+def clear_rate_series(level, path=None, catalog_path=None):
+    """クロールごとのクリア数・クリア率の推移（現在のWiki曲リスト基準）。
+    各クロールでは判定が変わった曲だけを分類し直すので、履歴が長くても軽い。
+    catalog_path を指定すると、曲リストはそのDBから読む（プレイヤーごとのDBには曲リストが無いため）"""
+    with datastore.reader(catalog_path or path) as conn:
+        charts = conn.execute(
+            "SELECT title, fingerprint FROM charts WHERE level = ? ORDER BY position", (level,)
+        ).fetchall()
+    changes = load_changes(level, path=path)
+
+    # 手動の対応付け・あいまい照合は analyze_level と同じく現在のスコアの曲名で解決する
+    # （別名の譜面は公式の曲名の指紋で照合し、対応無し(None)の譜面はずっと未プレイ）
+    def fingerprint(names):
+        return datastore.fingerprints(names, path)
+
+    df_my = datastore.load_scores(level, path)
+    aliases = {}
+    if not df_my.empty:
+        df_wiki = pd.DataFrame({"曲名": [title for title, _ in charts]})
+        aliases, _ = resolve_aliases(df_wiki, df_my, datastore.load_title_overrides(catalog_path or path),
+                                     fingerprint=fingerprint)
+    renamed = {title: aliases[str(title).strip()] for title, _ in charts if str(title).strip() in aliases}
+    alias_fp = dict(zip(renamed, fingerprint([target or "" for target in renamed.values()])))
+
+    charts_by_fp = {}
+    for title, fp in charts:
+        if title in renamed:
+            if renamed[title] is None:
+                continue
+            fp = alias_fp[title]
+        charts_by_fp.setdefault(fp, []).append(title)
+
+    status = {title: "unplayed" for title, _ in charts}
+    counts = Counter(status.values())
+    lamps = {}          # fingerprint -> {"EXPERT": 判定, "CHALLENGE": 判定}
+    titles = changes["title"].dropna().unique().tolist()
+    fp_of = dict(zip(titles, datastore.fingerprints(titles, path)))
+    rows = []
+
+    for (crawl_id, crawled_at), group in changes.groupby(["crawl_id", "crawled_at"], sort=False):
+        touched = set()
+        for title, difficulty, lamp in group[["title", "difficulty", "status"]].itertuples(index=False):
+            if pd.isna(title):
+                continue
+            fp = fp_of[title]
+            entry = lamps.setdefault(fp, {})
+            if pd.isna(lamp):
+                entry.pop(difficulty, None)
+            else:
+                entry[difficulty] = lamp
+            touched.add(fp)
+
+        for fp in touched & charts_by_fp.keys():
+            entry = lamps.get(fp)
+            for title in charts_by_fp[fp]:
+                new = chart_status(title, entry.get("EXPERT"), entry.get("CHALLENGE")) if entry else "unplayed"
+                counts[status[title]] -= 1
+                counts[new] += 1
+                status[title] = new
+
+        playable = len(charts) - counts["unplayed"]
+        rows.append({
+            "日時": pd.Timestamp(crawled_at),
+            "クリア済み": counts["cleared"],
+            "リベンジ": counts["revenge"],
+            "未プレイ": counts["unplayed"],
+            "全曲": len(charts),
+            "クリア率": counts["cleared"] / playable if playable else 0.0,
+        })
+
+    return pd.DataFrame(rows, columns=["日時", "クリア済み", "リベンジ", "未プレイ", "全曲", "クリア率"])
+
+
+def recency_weights(level, titles, half_life_days=14, boost=3.0, path=None):
+    """最近判定かベストスコアが変わった（＝最近挑戦して伸びた）譜面ほど大きくなる重み。
+    判定が未クリアのままでもスコアが伸びていれば対象になる（スコアの伸びない挑戦は公式データに残らないので数えられない）。
+    1 + boost * 0.5^(経過日数 / half_life_days)。履歴の無い曲は 1"""
+    with datastore.reader(path) as conn:
+        rows = conn.execute(
+            """SELECT c.title, MAX(k.crawled_at) FROM score_changes c JOIN crawls k ON k.id = c.crawl_id
+               WHERE c.level = ? AND c.status IS NOT NULL GROUP BY c.title""",
+            (level,),
+        ).fetchall()
+
+    last = {}
+    changed_fps = datastore.fingerprints([title for title, _ in rows], path)
+    for (title, crawled_at), fp in zip(rows, changed_fps):
+        last[fp] = max(last.get(fp, crawled_at), crawled_at)
+
+    now = pd.Timestamp.now()
+    weights = []
+    for fp in datastore.fingerprints(titles, path):
+        changed = last.get(fp)
+        if changed is None:
+            weights.append(1.0)
+            continue
+        days = max((now - pd.Timestamp(changed)).total_seconds() / 86400, 0.0)
+        weights.append(1.0 + boost * 0.5 ** (days / half_life_days))
+    return weights
@@ -1,143 +1,274 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.common.by import By
-from bs4 import BeautifulSoup
-import csv
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import os
+import sys
 import time
 
+import browser_session
+import crawl_checkpoint
+import datastore
+import html_parser
+import page_fixtures
+import levels as lv
+import players
+import tracing
+
 # --- 設定エリア ---
-score_filename = "my_ddr_data.csv"       # スコア保存用
-calorie_filename = "my_calorie_data.csv" # カロリー保存用
+base_dir = os.path.dirname(os.path.abspath(__file__))
+# スコア・カロリーは datastore（SQLite）へ保存
 
-# ユーザーから指定されたURL
-URL_SCORE = "https://p.eagate.573.jp/game/ddr/ddrworld/playdata/music_data_single.html?offset=0&filter=2&filtertype=18&display=score"
+# ユーザーから指定されたURL（ログイン確認にはLv18の1ページ目を使う）
+URL_SCORE = lv.score_url_template(lv.DEFAULT_LEVEL).format(offset=0)
 URL_WORKOUT = "https://p.eagate.573.jp/game/ddr/ddrworld/playdata/workout.html"
 
-# --- ブラウザ起動 ---
-options = webdriver.ChromeOptions()
-options.add_experimental_option("excludeSwitches", ["enable-automation"])
-options.add_experimental_option('useAutomationExtension', False)
-options.add_argument('--disable-blink-features=AutomationControlled')
-options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+# 並列取得の設定（サーバーに優しく）
+MAX_WORKERS = 4          # 同時接続数（全レベル合計）
+REQUEST_INTERVAL = 0.5   # リクエスト開始の最小間隔（秒）
+MAX_PAGES = 100          # 念のための上限
+LOGIN_WAIT = 300         # 画面から実行したときに手動ログインを待つ秒数
+
+# 取得途中のページの控え（失敗したら次回はそのページから取り直す。全ページ保存できたら消える）
+CHECKPOINT_DIR = os.path.join(base_dir, ".crawl", "official")
+
+
+SESSION_NAME = "official"   # browser_session のプロフィール名（プレイヤーごとに "official-<名前>"）
+
 
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+# --- ブラウザ起動（保存済みプロフィールを使う） ---
+def create_driver(headless=None, session=SESSION_NAME):
+    return browser_session.create_driver(session, headless=headless, stealth=True)
 
-try:
-    # ==========================================
-    # Phase 0: ログイン（スコアページを開始地点にする）
-    # ==========================================
+
+# --- スコア一覧が表示されていればログイン済み ---
+def is_logged_in(driver, timeout=10):
+    return browser_session.wait_for(driver, "tr.data", timeout=timeout)
+
+
+# --- ログイン（保存済みセッションがあれば画面なしで済ませる） ---
+def login(driver, wait_seconds=None, session=SESSION_NAME):
+    """wait_seconds を指定すると、Enter入力の代わりにスコア一覧が表示されるまで待つ（バックグラウンド実行用）"""
     driver.get(URL_SCORE)
-    
+    if is_logged_in(driver):
+        print("保存済みのログイン状態を使用します。")
+        return driver
+
+    if browser_session.has_valid_session(session):
+        # セッション切れ：画面付きで起動し直して手動ログインしてもらう
+        browser_session.mark_session(session, False)
+        driver.quit()
+        driver = create_driver(headless=False, session=session)
+        driver.get(URL_SCORE)
+
     print("\n" + "="*60)
     print("【手順1：ログイン】")
     print("ブラウザが開きました。KONAMI IDに手動でログインしてください。")
     print("ログイン後、スコア一覧が表示されたら準備完了です。")
     print("="*60 + "\n")
-    
-    input(">> ログイン完了したら Enter を押してください <<")
+
+    if wait_seconds is None:
+        input(">> ログイン完了したら Enter を押してください <<")
+    else:
+        is_logged_in(driver, timeout=wait_seconds)
 
     driver.get(URL_SCORE)
-    time.sleep(3)
+    if is_logged_in(driver):
+        # 次回からは画面なしで起動する
+        browser_session.mark_session(session, True)
+    return driver
 
-    # ==========================================
-    # Phase 1: スコア取得 (Lv18)
-    # ==========================================
-    print("\n" + "="*60)
-    print("【手順2：スコア取得】")
-    print("Lv18のデータ収集中...")
-    
-    total_songs = 0
-    page_num = 1
 
-    with open(score_filename, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["曲名", "EXPERT判定", "CHALLENGE判定"])
+# --- スコア一覧を offset 指定で並列取得 ---
+class CrawlIncomplete(RuntimeError):
+    """一部のページが取れなかった（途中までの結果で保存してはいけない）"""
+
+
+class NotScorePage(RuntimeError):
+    """スコア一覧ではないページが返った（ログイン切れ・メンテナンス画面など。一覧の終わりとは区別する）"""
+
+
+def checkpoint_for(level, player=None):
+    return crawl_checkpoint.CrawlCheckpoint(
+        os.path.join(CHECKPOINT_DIR, players.normalize_player(player), f"lv{level}")
+    )
+
 
+def fetch_score_pages(session, url_template, max_workers=MAX_WORKERS, interval=REQUEST_INTERVAL,
+                      max_pages=MAX_PAGES, timeout=30, on_page=None, limiter=None, checkpoint=None):
+    """offset=0,1,2... を並列に取得し、届いたページから順に解析する。
+    スコア表はあるが行が無いページ（または前のページと同じ内容）で打ち切り、ページ順の行リストを返す。
+    取れなかったページ・スコア一覧ではないページがあれば、残りのページを取り終えてから CrawlIncomplete を送出する
+    （1ページ目からスコア一覧ではない＝ログインが引き継げていないときは空のリスト）。
+    checkpoint (CrawlCheckpoint) を渡すと、取れたページを1ページずつ控え、控え済みのページは取得しない"""
+    limiter = limiter or browser_session.RateLimiter(interval)
+
+    def fetch(offset):
+        limiter.wait()
+        with tracing.span("http_get", offset=offset):
+            response = session.get(url_template.format(offset=offset), timeout=timeout)
+            response.raise_for_status()
+        with tracing.span("parse"):
+            rows = html_parser.parse_score_rows(response.content)
+            if not rows and not html_parser.is_score_page(response.content):
+                raise NotScorePage("スコア一覧ではないページです（ログイン切れ・メンテナンスなど）")
+            return rows
+
+    pages = {}
+    failed = {}
+    last_offset = max_pages
+    next_offset = 0
+
+    def accept(offset, rows):
+        nonlocal last_offset
+        if rows:
+            pages[offset] = rows
+            if on_page:
+                on_page(offset, rows)
+        else:
+            last_offset = min(last_offset, offset)
+
+    fetch = tracing.wrap(fetch)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
         while True:
-            print(f"  - Page {page_num}...")
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            rows = soup.find_all('tr', class_='data')
+            while next_offset < last_offset and len(running) < max_workers:
+                if checkpoint is not None and next_offset in checkpoint:
+                    # 前回取れたページは控えから使う
+                    accept(next_offset, checkpoint.get(next_offset))
+                else:
+                    running[pool.submit(fetch, next_offset)] = next_offset
+                next_offset += 1
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                offset = running.pop(future)
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    # 他のページは取り続ける（取れた分は控えておき、次回はこのページから）
+                    failed[offset] = e
+                    continue
+                if checkpoint is not None:
+                    checkpoint.put(offset, rows)
+                accept(offset, rows)
+
+    failed = {offset: e for offset, e in failed.items() if offset < last_offset}
+    if not pages and isinstance(failed.get(0), NotScorePage):
+        # 最初からスコア一覧が見られない（呼び出し側がブラウザで巡回し直す）
+        return []
+    if failed:
+        detail = ", ".join(f"Page {offset + 1} ({e})" for offset, e in sorted(failed.items()))
+        raise CrawlIncomplete(f"取得できなかったページがあります: {detail}")
+
+    # 範囲外の offset で最終ページが繰り返される場合に備えて、重複ページ以降は捨てる
+    result = []
+    for offset in range(last_offset):
+        rows = pages.get(offset)
+        if not rows or (result and rows == result[-1]):
+            break
+        result.append(rows)
+    return result
+
+
+# --- 複数レベルを並列取得 ---
+def fetch_levels(session, levels, max_workers=MAX_WORKERS, interval=REQUEST_INTERVAL,
+                 url_template_for=lv.score_url_template, on_page=None, checkpoints=None):
+    """レベルごとに fetch_score_pages を並列実行し、{レベル: ページ順の行リスト} を返す。
+    間隔制限は全レベルで共有するので、サーバーへの負荷はレベル数を増やしても変わらない。
+    checkpoints ({レベル: CrawlCheckpoint}) を渡すと、レベルごとに途中経過を控える"""
+    checkpoints = checkpoints or {}
+    limiter = browser_session.RateLimiter(interval)
+    level_workers = max(1, min(len(levels), max_workers))
+    page_workers = max(1, max_workers // level_workers)
+
+    def fetch(level):
+        with tracing.span(f"Lv{level}"):
+            return fetch_score_pages(
+                session, url_template_for(level), max_workers=page_workers, limiter=limiter,
+                on_page=(lambda offset, rows: on_page(level, offset, rows)) if on_page else None,
+                checkpoint=checkpoints.get(level),
+            )
+
+    fetch = tracing.wrap(fetch)
+    with ThreadPoolExecutor(max_workers=level_workers) as pool:
+        futures = {level: pool.submit(fetch, level) for level in levels}
+    # 1レベルでも取り切れなければ全体を失敗にする（取れたページは控えてあるので、やり直しは速い）
+    errors = []
+    for level, future in futures.items():
+        try:
+            future.result()
+        except CrawlIncomplete as e:
+            errors.append(f"Lv{level}: {e}")
+    if errors:
+        raise CrawlIncomplete("\n".join(errors))
+    return {level: future.result() for level, future in futures.items()}
+
+
+# --- ブラウザで「次へ」をクリックしながら取得（フォールバック用） ---
+def crawl_pages_with_driver(driver, on_html=None):
+    """「次へ」が無くなるまで巡回する。途中で画面操作に失敗したら CrawlIncomplete（途中までの結果は返さない）。
+    on_html(ページ番号(0始まり), HTML) を渡すと、解析する前のHTMLを渡す（記録用）"""
+    pages = []
+    while True:
+        print(f"  - Page {len(pages) + 1}...")
+        html = driver.page_source
+        if on_html:
+            on_html(len(pages), html)
+        rows = html_parser.parse_score_rows(html)
 
-            if not rows:
-                print("  データなし。スコア収集を終了します。")
+        if not rows:
+            if not html_parser.is_score_page(html):
+                raise CrawlIncomplete(f"Page {len(pages) + 1} がスコア一覧ではありませんでした（ログイン切れ・メンテナンスなど）")
+            print("  データなし。スコア収集を終了します。")
+            break
+
+        pages.append(rows)
+
+        # 「次へ」ボタン処理
+        try:
+            next_div = driver.find_element(By.ID, "next")
+            next_link = next_div.find_element(By.TAG_NAME, "a")
+        except NoSuchElementException:
+            # 「次へ」が無い＝最終ページ
+            break
+        try:
+            href = next_link.get_attribute("href")
+
+            # JavaScriptのリンクか、空リンクなら終了
+            if not href or "javascript:void(0)" in href:
                 break
 
-            for row in rows:
-                # 曲名取得
-                title_div = row.find('div', class_='music_tit')
-                song_name = title_div.text.strip() if title_div else row.find('a').text.strip()
-
-                # 判定取得ロジック
-                def check_status(diff_id):
-                    td = row.find('td', id=diff_id)
-                    if not td: return "データなし"
-                    img = td.find('img')
-                    if not img: return "未プレイ"
-                    src = img.get('src', '')
-                    return "未クリア(E)" if 'rank_s_e' in src else "クリア済み"
-
-                exp = check_status('expert')
-                cha = check_status('challenge')
-                
-                writer.writerow([song_name, exp, cha])
-                total_songs += 1
-
-            # 「次へ」ボタン処理
-            try:
-                next_div = driver.find_element(By.ID, "next")
-                next_link = next_div.find_element(By.TAG_NAME, "a")
-                href = next_link.get_attribute("href")
-                
-                # JavaScriptのリンクか、空リンクなら終了
-                if not href or "javascript:void(0)" in href:
-                    break 
-
-                driver.execute_script("arguments[0].click();", next_link)
-                time.sleep(3) 
-                page_num += 1
-            except:
-                break 
-    
-    print(f"✅ スコア保存完了: {total_songs}曲 -> {score_filename}")
-
-
-    # ==========================================
-    # Phase 2: カロリー取得 (ワークアウトページ)
-    # ==========================================
-    print("\n" + "="*60)
-    print("【手順3：ワークアウトデータ取得】")
-    print("ワークアウトページへ自動移動します...")
-    
-    driver.get(URL_WORKOUT)
-    time.sleep(3) # 読み込み待ち
-
-    print("解析中...")
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
-    
-    # 画像で確認した id="work_out_left" のテーブルを探す
-    table = soup.find('table', id='work_out_left')
-    
+            driver.execute_script("arguments[0].click();", next_link)
+            time.sleep(3)
+        except Exception as e:
+            raise CrawlIncomplete(f"Page {len(pages) + 1} の次のページへ進めませんでした ({e})") from e
+    return pages
+
+
+# --- ワークアウトページの解析 ---
+def parse_workout(html):
+    """ワークアウトページから [日付, 曲数, 消費カロリー] のリストを返す"""
+    # 画像で確認した id="work_out_left" のテーブルの行（セル文字列のリスト）
+    rows = html_parser.parse_workout_rows(html)
+
     calorie_data = []
 
-    if table:
-        # ヘッダー以外の行(tr)を取得
-        rows = table.find_all('tr')
-        
-        for row in rows:
-            cells = row.find_all('td')
+    if rows is not None:
+        for cells in rows:
             # 画像の通り、tdが5つある行がデータ行 (No, 日付, 曲数, カロリー, 体重)
             if len(cells) >= 4:
                 try:
                     # インデックス1: 日付 (2026-01-19)
-                    date_text = cells[1].text.strip()
-                    
+                    date_text = cells[1].strip()
+
                     # インデックス2: 曲数 (20 曲) -> " 曲"を消す
-                    count_text = cells[2].text.strip().replace("曲", "").strip()
-                    
+                    count_text = cells[2].strip().replace("曲", "").strip()
+
                     # インデックス3: カロリー (791.389 kcal) -> " kcal"を消す
-                    kcal_text = cells[3].text.strip().replace("kcal", "").strip()
-                    
+                    kcal_text = cells[3].strip().replace("kcal", "").strip()
+
                     # リストに追加
                     if date_text and kcal_text:
                         calorie_data.append([date_text, count_text, kcal_text])
@@ -147,21 +278,186 @@ try:
     else:
         print("⚠️ テーブル(id=work_out_left)が見つかりませんでした。")
 
-    # CSV保存
-    if calorie_data:
-        with open(calorie_filename, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(["日付", "曲数", "消費カロリー"]) # ヘッダーに曲数を追加
-            writer.writerows(calorie_data)
-        print(f"✅ カロリー保存完了: {len(calorie_data)}件 -> {calorie_filename}")
-    else:
-        print("⚠️ データが取得できませんでした。")
+    return calorie_data
+
+
+def scrape_official(levels=None, progress=None, player=None, record=None, replay=None):
+    """公式サイトから指定レベルのスコアとワークアウトを取得してdatastoreに保存し、結果をdictで返す。
+    progress(phase, detail, current, total) を渡すと工程ごとの進み具合を通知する（このときログインは入力待ちにしない）。
+    player を指定すると、そのプレイヤーのログイン状態を使い、そのプレイヤーのDBに保存する。
+    record に名前（またはパス）を渡すと、取得したページを page_fixtures のアーカイブに記録する（全ページを取り直す）。
+    replay に記録の名前を渡すと、ブラウザを使わず記録したページを同じ解析・保存の処理に流す
+    （保存先はプレイヤーのDBではなく、アーカイブの隣の再生用DB）。
+    工程ごとの処理時間は tracing に "official" として記録される"""
+    levels = lv.parse_levels(levels)
+    player = players.normalize_player(player)
+    with tracing.run("official", levels=levels, player=player, replay=bool(replay)):
+        return _scrape_official(levels, progress, player, record, replay)
+
+
+def _scrape_official(levels, progress, player, record=None, replay=None):
+    start = time.perf_counter()
+    report = progress or (lambda *args: None)
+    session_name = players.session_name(SESSION_NAME, player)
+    fixture = page_fixtures.Fixture(replay) if replay else None
+    # 再生は古い記録のこともあるので、プレイヤーのDB（スコアと履歴）には書かない
+    path = fixture.scratch_db() if fixture is not None else players.db_path(player)
+    recorder = page_fixtures.Recorder(record) if record and not fixture else None
+    driver = None
+    if fixture is None:
+        with tracing.span("create_driver"):
+            driver = create_driver(session=session_name)
+
+    try:
+        # ==========================================
+        # Phase 0: ログイン（スコアページを開始地点にする）
+        # ==========================================
+        if fixture is None:
+            report("login", "ログイン確認中")
+            with tracing.span("login"):
+                driver = login(driver, wait_seconds=LOGIN_WAIT if progress else None, session=session_name)
+        else:
+            print(f"記録したページを再生します: {fixture.path} ({len(fixture)}ページ) -> {path}")
+
+        # ==========================================
+        # Phase 1: スコア取得（指定レベルを並列で）
+        # ==========================================
+        print("\n" + "="*60)
+        print("【手順2：スコア取得】")
+        print(f"Lv{', Lv'.join(map(str, levels))} のデータ収集中...")
+
+        # ログイン済みCookieをHTTPセッションへ移して、ページを並列取得（再生時は記録から返すだけなので間隔を空けない）
+        if fixture is not None:
+            session = fixture.session()
+        else:
+            session = browser_session.create_http_session(driver, pool_size=MAX_WORKERS)
+            if recorder is not None:
+                session = recorder.wrap(session)
+        fetched = []
+
+        def on_page(level, offset, rows):
+            print(f"  - Lv{level} Page {offset + 1}: {len(rows)}曲")
+            fetched.append(offset)
+            report("scores", f"Lv{level} Page {offset + 1}", len(fetched), None)
+
+        # 前回途中で止まったレベルは、取れていたページを控えから使う（記録・再生のときは控えを使わない）
+        checkpoints = {}
+        if fixture is None and recorder is None:
+            checkpoints = {level: checkpoint_for(level, player) for level in levels}
+        resumed = sum(len(c) for c in checkpoints.values())
+        if resumed:
+            print(f"  前回取得済みの {resumed} ページを再利用します")
+
+        report("scores", "スコア一覧を取得中")
+        with tracing.span("fetch_pages"):
+            pages_by_level = fetch_levels(session, levels, interval=0 if fixture else REQUEST_INTERVAL,
+                                          on_page=on_page, checkpoints=checkpoints)
+
+        level_results = {}
+        for level in levels:
+            pages = pages_by_level[level]
+            if not pages and driver is not None:
+                # Cookieが引き継げなかった等の場合は、従来通りブラウザで巡回
+                print(f"  Lv{level}: HTTP取得でデータが無かったため、ブラウザで巡回します...")
+                url_template = lv.score_url_template(level)
+                # 記録するときは、HTTPで取ったときと同じURLで残す（再生はHTTPの経路で読める）
+                on_html = (lambda i, html: recorder.add(url_template.format(offset=i), html)) if recorder else None
+                with tracing.span("browser_crawl", level=level):
+                    driver.get(url_template.format(offset=0))
+                    browser_session.wait_for(driver, "tr.data")
+                    pages = crawl_pages_with_driver(driver, on_html=on_html)
+                if recorder is not None:
+                    # 「次へ」が無くなって止まったときは空のページを取っていないので、
+                    # 再生でHTTPの経路が次の offset を読んだときに一覧の終わりになるよう空のページを入れる
+                    recorder.add(url_template.format(offset=len(pages)), page_fixtures.END_PAGE)
+
+            level_results[level] = {"scores": sum(len(rows) for rows in pages), "pages": len(pages)}
+            if not pages:
+                # 空で上書きすると全曲が未プレイ扱いになるので、前回のデータを残す
+                print(f"⚠️ Lv{level}: データが取得できなかったため、保存をスキップしました。")
+                if level in checkpoints:
+                    checkpoints[level].clear()
+                continue
+
+            # 全ページ揃ってから1トランザクションで保存する（途中までのデータが見えることは無い）
+            with tracing.span("save_scores", level=level):
+                datastore.upsert_scores(level, [row for rows in pages for row in rows], path=path)
+            if level in checkpoints:
+                checkpoints[level].clear()
+            print(f"✅ スコア保存完了: Lv{level} {level_results[level]['scores']}曲 -> {path}")
+
+        total_songs = sum(r["scores"] for r in level_results.values())
+        page_num = sum(r["pages"] for r in level_results.values())
+
+
+        # ==========================================
+        # Phase 2: カロリー取得 (ワークアウトページ)
+        # ==========================================
+        print("\n" + "="*60)
+        print("【手順3：ワークアウトデータ取得】")
+        print("ワークアウトページへ自動移動します...")
+
+        report("workout", "ワークアウトページを取得中")
+        with tracing.span("workout_page"):
+            if fixture is not None:
+                workout_html = fixture.get(URL_WORKOUT)
+            else:
+                driver.get(URL_WORKOUT)
+                browser_session.wait_for(driver, "#work_out_left") # 読み込み待ち
+                workout_html = driver.page_source
+                if recorder is not None:
+                    recorder.add(URL_WORKOUT, workout_html)
+
+        print("解析中...")
+        with tracing.span("parse_workout"):
+            calorie_data = parse_workout(workout_html)
+
+        # 保存（日付ごとに上書きするので、表示期間外の過去の日も残る）
+        if calorie_data:
+            with tracing.span("save_workouts"):
+                datastore.upsert_workouts(calorie_data, path=path)
+            print(f"✅ カロリー保存完了: {len(calorie_data)}件 -> {path}")
+        else:
+            print("⚠️ データが取得できませんでした。")
+
+        if recorder is not None:
+            print(f"📼 取得したページを記録しました: {recorder.save()} ({len(recorder)}ページ)")
+
+        print("\n🎉 全工程終了！お疲れ様でした！")
+        return {
+            "player": player,
+            "scores": total_songs,
+            "pages": page_num,
+            "levels": level_results,
+            "workouts": len(calorie_data),
+            "elapsed": time.perf_counter() - start,
+        }
+
+    finally:
+        # ログイン状態はプロフィールに保存されるので、ブラウザは閉じてよい
+        if driver is not None:
+            driver.quit()
+
 
-    print("\n🎉 全工程終了！お疲れ様でした！")
+def main(argv=None):
+    # 例: python scrape_official_ddr.py 17 18 / python scrape_official_ddr.py all
+    # --player 名前 を付けると、そのプレイヤーとしてログインし、そのプレイヤーのDBに保存する
+    # --record 名前 で取得したページを記録し、--replay 名前 でブラウザを使わずに記録を再生する
+    args = list(sys.argv[1:] if argv is None else argv)
+    options = {}
+    for flag in ("--player", "--record", "--replay"):
+        if flag in args:
+            i = args.index(flag)
+            options[flag[2:]] = args[i + 1] if i + 1 < len(args) else None
+            del args[i:i + 2]
+    player = options.pop("player", None)
+    try:
+        if player:
+            players.create_player(player)
+        scrape_official(args, player=player, **options)
+    except Exception as e:
+        print(f"エラー: {e}")
 
-except Exception as e:
-    print(f"エラー: {e}")
 
-finally:
-    # driver.quit() # ブラウザを閉じたい場合はコメントアウトを外す
-    pass
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,84 +1,329 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import sys
 import time
-import csv
-
-# ターゲットURL
-url = "https://w.atwiki.jp/asigami/pages/19.html"
-
-print(" ブラウザを起動しています...")
-
-# 1. Chromeを起動する準備（ここが最強のポイント）
-options = webdriver.ChromeOptions()
-# options.add_argument('--headless') # これを有効にすると画面を出さずに裏で動く（今回は見たいのでコメントアウト）
-
-# ドライバを自動インストールして起動
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-
-try:
-    print(f"アクセス中: {url}")
-    driver.get(url)
-
-    # 2. 【重要】ページが完全に表示されるまで待つ
-    # AtWikiは表示に少しラグがあるのと、セキュリティチェックを通過する時間を待つ
-    print(" 読み込み待ち（5秒）...")
-    time.sleep(5)
-
-    # 3. 表示された状態の「生のHTML」を全部引っこ抜く
-    html = driver.page_source
-    
-    print("データ取得成功！解析します。")
-
-    # ここからは使い慣れたBeautifulSoupにバトンタッチ
-    soup = BeautifulSoup(html, 'html.parser')
-    
-    # 保存準備
-    filename = "DDR18_songs.csv"
-    count = 0
-
-    with open(filename, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["曲名"])
-        
-        # テーブルの行(tr)を探す
-        # AtWikiの本文エリアに絞る
-        main_content = soup.find('div', id='wikibody')
-        # テーブルの行(tr)をループ
-        for row in main_content.find_all('tr'):
-            
-            # 1. 行の中にある「セル（td）」をリストとして全部取得
-            cells = row.find_all('td')
-
-            # セルがない行（ヘッダーなど）や、空っぽの行は無視して飛ばす
-            if not cells:
-                continue
-
-            # 2. 画像の通り、曲名は「1つ目のセル（[0]）」にある
-            target_cell = cells[0]
-
-            # 3. そのセルの中に「リンク（aタグ）」があるか探す
-            link_tag = target_cell.find('a')
-
-            # リンクが見つかったら、そのテキスト（曲名）を取り出す
-            if link_tag:
-                song_name = link_tag.text.strip()
-                
-                # CSVに書き込み
-                writer.writerow([song_name])
-                count += 1
-                
-                # 画面確認用
-                if count <= 5:
-                    print(f"抽出成功: {song_name}")
-
-    print(f"\n 完了！ {count}件のデータを '{filename}' に保存しました。")
-
-except Exception as e:
-    print(f"エラー: {e}")
-
-finally:
-    # 最後はブラウザを閉じる
-    print("ブラウザを終了します。")
-    driver.quit()
+
+import browser_session
+import datastore
+import html_parser
+import levels as lv
+import page_fixtures
+import tracing
+
+# ターゲットURLは levels.WIKI_PAGES、保存先は datastore（SQLite）
+SESSION_NAME = "wiki"   # browser_session のプロフィール名
+
+# 2ページ目以降の並列取得の設定
+MAX_WORKERS = 4
+REQUEST_INTERVAL = 1.0
+
+# 取得したHTMLの控え（オフラインで解析し直せるように）と、前回取得時の検証情報
+base_dir = os.path.dirname(os.path.abspath(__file__))
+RAW_DIR = os.path.join(base_dir, ".wiki_cache")
+STATE_FILE = os.path.join(RAW_DIR, "state.json")
+
+
+# --- 変更検知 ---
+def raw_file(level):
+    return os.path.join(RAW_DIR, f"lv{level}.html")
+
+
+def load_state():
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            return {int(k): v for k, v in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    os.makedirs(RAW_DIR, exist_ok=True)
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({str(k): v for k, v in sorted(state.items())}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, STATE_FILE)
+
+
+def save_raw(level, html):
+    os.makedirs(RAW_DIR, exist_ok=True)
+    data = html.encode("utf-8") if isinstance(html, str) else html
+    with open(raw_file(level), "wb") as f:
+        f.write(data)
+
+
+def songs_digest(songs):
+    # 曲リスト（抽出結果）のハッシュ。ページの広告などが変わっても曲リストが同じなら「変更なし」
+    return hashlib.sha256("\n".join(songs).encode("utf-8")).hexdigest()
+
+
+def _fetch_conditional(session, level, previous):
+    """ブラウザ無しで条件付きGETする。
+    (曲リスト or None(304), レスポンス) を返す。セキュリティチェックなどで曲表が無ければ例外"""
+    headers = {}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+    with tracing.span("http_get", level=level):
+        response = session.get(lv.WIKI_PAGES[level], headers=headers, timeout=30)
+    if response.status_code == 304:
+        return None, response
+    response.raise_for_status()
+    with tracing.span("parse", level=level):
+        return html_parser.parse_wiki_songs(response.content), response
+
+
+def _fetch_rest(driver, levels):
+    """1ページ目でセキュリティチェックを通過したCookieを使い、残りのレベルをHTTPで並列取得する。
+    {レベル: (曲リスト, 生HTML)} を返す"""
+    session = browser_session.create_http_session(driver, pool_size=MAX_WORKERS)
+    limiter = browser_session.RateLimiter(REQUEST_INTERVAL)
+
+    def fetch(level):
+        limiter.wait()
+        with tracing.span("http_get", level=level):
+            response = session.get(lv.WIKI_PAGES[level], timeout=30)
+            response.raise_for_status()
+        with tracing.span("parse", level=level):
+            return html_parser.parse_wiki_songs(response.content), response.content
+
+    fetch = tracing.wrap(fetch)
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(levels))) as pool:
+        futures = {level: pool.submit(fetch, level) for level in levels}
+    for level, future in futures.items():
+        try:
+            results[level] = future.result()
+        except Exception as e:
+            print(f"  Lv{level}: HTTP取得に失敗 ({e})")
+    return results
+
+
+def _fetch_with_validators(levels, state):
+    """前回の ETag / Last-Modified を付けてHTTPで取得する。
+    {レベル: (曲リスト or None(304), レスポンス)} を返す（取れなかったレベルは含まない）"""
+    session = browser_session.create_http_session(pool_size=MAX_WORKERS)
+    limiter = browser_session.RateLimiter(REQUEST_INTERVAL)
+
+    def fetch(level):
+        limiter.wait()
+        return _fetch_conditional(session, level, state.get(level, {}))
+
+    fetch = tracing.wrap(fetch)
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(levels))) as pool:
+        futures = {level: pool.submit(fetch, level) for level in levels}
+    for level, future in futures.items():
+        try:
+            results[level] = future.result()
+        except Exception as e:
+            print(f"  Lv{level}: ブラウザ無しでは取得できませんでした ({e})")
+    return results
+
+
+def _scrape_with_browser(levels):
+    """ブラウザで取得する（セキュリティチェックが出る場合）。{レベル: (曲リスト, 生HTML)} を返す"""
+    print(" ブラウザを起動しています...")
+
+    # 1. Chromeを起動（前回成功していれば画面なし・ドライバもキャッシュ済みのものを使う）
+    with tracing.span("create_driver"):
+        driver = browser_session.create_driver(SESSION_NAME)
+
+    try:
+        first = levels[0]
+        print(f"アクセス中: {lv.WIKI_PAGES[first]}")
+        with tracing.span("browser_page", level=first):
+            driver.get(lv.WIKI_PAGES[first])
+
+            # 2. 【重要】ページが完全に表示されるまで待つ
+            # AtWikiは表示に少しラグがあるのと、セキュリティチェックを通過する時間を待つ
+            print(" 読み込み待ち...")
+            browser_session.wait_for(driver, "#wikibody tr", timeout=15)
+
+        # 3. 表示された状態の「生のHTML」を全部引っこ抜いて解析
+        # AtWikiの本文エリアの表から、各行1つ目のセルのリンク（曲名）を取り出す
+        html = driver.page_source
+        with tracing.span("parse", level=first):
+            pages = {first: (html_parser.parse_wiki_songs(html), html)}
+        print("データ取得成功！解析します。")
+        for song_name in pages[first][0][:5]:
+            # 画面確認用
+            print(f"抽出成功: {song_name}")
+
+        # 4. 残りのレベルはHTTPで並列取得（失敗したものだけブラウザで取り直す）
+        if len(levels) > 1:
+            pages.update(_fetch_rest(driver, levels[1:]))
+        for level in levels:
+            if not pages.get(level, ([], None))[0]:
+                with tracing.span("browser_page", level=level):
+                    driver.get(lv.WIKI_PAGES[level])
+                    browser_session.wait_for(driver, "#wikibody tr", timeout=15)
+                html = driver.page_source
+                with tracing.span("parse", level=level):
+                    pages[level] = (html_parser.parse_wiki_songs(html), html)
+
+        # 取得できたら次回からは画面なしで起動する
+        browser_session.mark_session(SESSION_NAME, any(songs for songs, _ in pages.values()))
+        return pages
+
+    finally:
+        # 最後はブラウザを閉じる
+        print("ブラウザを終了します。")
+        driver.quit()
+
+
+def scrape_wiki(levels=None, offline=False, progress=None, record=None, replay=None):
+    """AtWikiから指定レベルの曲リストを取得してdatastoreに保存し、結果をdictで返す。
+    前回と曲リストが同じレベルは保存しない（datastoreの更新番号が変わらないので、画面のキャッシュや分析結果はそのまま）。
+    offline=True なら取得せず、控えておいたHTMLを解析し直す。
+    record に名前（またはパス）を渡すと、取得したページを page_fixtures のアーカイブに記録する（304を使わず全ページ取る）。
+    replay に記録の名前を渡すと、取得せずに記録したページを解析する（保存先はアーカイブの隣の再生用DB。検証情報も書き換えない）。
+    progress(phase, detail, current, total) を渡すと工程ごとの進み具合を通知する。
+    工程ごとの処理時間は tracing に "wiki" として記録される"""
+    levels = lv.parse_levels(levels)
+    with tracing.run("wiki", levels=levels, offline=offline, replay=bool(replay)):
+        return _scrape_wiki(levels, offline, progress, record, replay)
+
+
+def _scrape_wiki(levels, offline, progress, record=None, replay=None):
+    start = time.perf_counter()
+    report = progress or (lambda *args: None)
+    skipped = [level for level in levels if level not in lv.WIKI_PAGES]
+    levels = [level for level in levels if level in lv.WIKI_PAGES]
+    if skipped:
+        print(f"WikiページURLが未登録のためスキップ: Lv{', Lv'.join(map(str, skipped))}")
+    if not levels:
+        raise ValueError("取得できるレベルがありません (levels.WIKI_PAGES にURLを登録してください)")
+
+    # 再生は古い記録のこともあるので、本物のDBと検証情報（state）には書かない
+    fixture = page_fixtures.Fixture(replay) if replay else None
+    path = fixture.scratch_db() if fixture is not None else datastore.DB_FILE
+    state = {} if fixture is not None else load_state()
+    pages = {}          # レベル -> (曲リスト, 生HTML)
+    validators = {}     # レベル -> 今回の ETag / Last-Modified
+    not_modified = []   # 304 が返ったレベル
+
+    if fixture is not None:
+        print(f"記録したページを再生します: {fixture.path} -> {path}")
+        for level in levels:
+            html = fixture.get(lv.WIKI_PAGES[level])
+            with tracing.span("parse", level=level):
+                pages[level] = (html_parser.parse_wiki_songs(html), None)
+        offline = True   # 以降は控えの再解析と同じ（控えと検証情報は書き換えない）
+    elif offline:
+        for level in levels:
+            if not os.path.exists(raw_file(level)):
+                raise FileNotFoundError(f"Lv{level} のHTMLの控えがありません ({raw_file(level)})")
+            with open(raw_file(level), "rb") as f:
+                html = f.read()
+            with tracing.span("parse", level=level):
+                pages[level] = (html_parser.parse_wiki_songs(html), None)
+    else:
+        # 1. まずはブラウザ無しで条件付きGET（セキュリティチェックが出なければChromeは起動しない）
+        #    記録するときは 304 で本文が無いと残せないので、検証情報を付けずに取る
+        report("wiki", "更新確認中", 0, len(levels))
+        with tracing.span("conditional_get"):
+            fetched = _fetch_with_validators(levels, {} if record else state)
+            # 304 でもDBに曲リストが無ければ（DBを作り直した後など）、検証情報を付けずに取り直す
+            missing = [level for level, (songs, _) in fetched.items()
+                       if songs is None and not datastore.has_data("charts", level)]
+            if missing:
+                fetched.update(_fetch_with_validators(missing, {}))
+                for level in missing:
+                    if fetched.get(level, (None,))[0] is None:
+                        fetched.pop(level, None)   # 取り直せなければブラウザで取得する
+        for level, (songs, response) in fetched.items():
+            if songs is None:
+                not_modified.append(level)
+            elif not songs:
+                continue   # 曲表の無いページ（セキュリティチェックなど）の検証情報は残さない
+            else:
+                pages[level] = (songs, response.content)
+            validators[level] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+
+        # 2. 取れなかったレベルだけブラウザで取得
+        rest = [level for level in levels if level not in pages and level not in not_modified]
+        if rest:
+            report("wiki", "ブラウザで取得中", len(levels) - len(rest), len(levels))
+            with tracing.span("browser"):
+                pages.update(_scrape_with_browser(rest))
+
+        if record:
+            recorder = page_fixtures.Recorder(record)
+            for level, (_, html) in pages.items():
+                recorder.add(lv.WIKI_PAGES[level], html)
+            print(f"📼 取得したページを記録しました: {recorder.save()} ({len(recorder)}ページ)")
+
+    # 3. 曲リストのハッシュを前回と比べ、変わったレベルだけ保存
+    report("wiki", "保存中", len(levels), len(levels))
+    level_results = {}
+    changed = []
+    unchanged = list(not_modified)
+    for level in levels:
+        if level in not_modified:
+            print(f"Lv{level}: 変更なし (304 Not Modified)")
+            level_results[level] = {"songs": state[level].get("songs", 0), "changed": False}
+            continue
+
+        songs, html = pages[level]
+        digest = songs_digest(songs)
+        entry = state.get(level, {})
+        if not offline:
+            save_raw(level, html)
+            entry.update(validators.get(level, {"etag": None, "last_modified": None}))
+            entry["fetched_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+        if songs and digest == entry.get("digest") and datastore.has_data("charts", level, path):
+            unchanged.append(level)
+            print(f"Lv{level}: 変更なし ({len(songs)}件)")
+            level_results[level] = {"songs": len(songs), "changed": False}
+        else:
+            with tracing.span("save_charts", level=level):
+                datastore.replace_charts(level, songs, path=path)
+            changed.append(level)
+            entry["digest"] = digest
+            print(f"\n 完了！ Lv{level}: {len(songs)}件のデータを '{path}' に保存しました。")
+            level_results[level] = {"songs": len(songs), "song_list": songs, "changed": True}
+        entry["songs"] = len(songs)
+        state[level] = entry
+
+    if fixture is None:
+        save_state(state)
+    return {
+        "status": "changed" if changed else "unchanged",
+        "songs": sum(r["songs"] for r in level_results.values()),
+        "levels": level_results,
+        "changed": changed,
+        "unchanged": sorted(unchanged),
+        "skipped": skipped,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def main(argv=None):
+    # 例: python scrapping_wiki_data.py 18 / python scrapping_wiki_data.py all
+    # --offline を付けると、取得せずに控えておいたHTMLを解析し直す
+    # --record 名前 で取得したページを記録し、--replay 名前 で記録を再生する
+    args = list(sys.argv[1:] if argv is None else argv)
+    offline = "--offline" in args
+    args = [a for a in args if a != "--offline"]
+    options = {}
+    for flag in ("--record", "--replay"):
+        if flag in args:
+            i = args.index(flag)
+            options[flag[2:]] = args[i + 1] if i + 1 < len(args) else None
+            del args[i:i + 2]
+    try:
+        result = scrape_wiki(args, offline=offline, **options)
+        print(result["status"])
+    except Exception as e:
+        print(f"エラー: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import dashboard
+import datastore
+import levels as lv
+import players
+import workout_stats
+
+# 使い方: python stats_server.py                      (http://127.0.0.1:8765/stats?level=18 でクリア率などをJSONで返す)
+#         python stats_server.py --port 9000 --host 0.0.0.0
+# 配信のオーバーレイ用の読み取り専用のAPI。JSONはデータが変わったときだけ作り直し、
+# ETag が同じなら 304 だけを返すので、毎秒取りに来ても負荷はほぼ無い
+
+# ==========================================
+# 設定エリア
+# ==========================================
+HOST = "127.0.0.1"
+PORT = 8765
+RECENT_WINDOWS = (1, 7, 30)   # ワークアウトの直近の集計期間（日）。1 は今日の分
+# ==========================================
+
+
+class ChangeWatcher:
+    """DBが書き換えられたかを PRAGMA data_version で調べる（ファイルを読み直さないので軽い）。
+    data_version は他の接続がコミットするたびに変わるので、DBごとに接続を開きっぱなしにしておく"""
+
+    def __init__(self):
+        self._conns = {}
+        self._lock = threading.Lock()
+
+    def version(self, *paths):
+        with self._lock:
+            versions = []
+            for path in paths:
+                conn = self._conns.get(path)
+                if conn is None:
+                    datastore.connect(path).close()   # スキーマを用意してから開く
+                    conn = self._conns[path] = sqlite3.connect(path, check_same_thread=False)
+                versions.append(conn.execute("PRAGMA data_version").fetchone()[0])
+            return tuple(versions)
+
+
+def _recent(stats, window, today):
+    recent = stats.recent(window, today)
+    return {"kcal": round(float(recent["kcal"]), 1), "songs": recent["songs"], "days": recent["days"]}
+
+
+def build_stats(level, player):
+    """ダッシュボードと同じ数値のdict（app.py と同じく datastore の1つの版から読む）"""
+    with datastore.snapshot(datastore.DB_FILE, players.db_path(player)):
+        lists = players.chart_lists(player, level)
+        df_calories = players.load("workouts", player=player)
+
+    clear = dashboard.clear_stats(lists["total"], len(lists["revenge"]), len(lists["unplayed"]))
+    stats = workout_stats.WorkoutStats(df_calories)
+    totals = stats.totals()
+    today = date.today()
+    return {
+        "player": player,
+        "level": level,
+        "clear": {
+            "clear_rate": round(clear["clear_rate"], 4),
+            "all_clear_rate": round(clear["all_clear_rate"], 4),
+            "cleared": clear["cleared"],
+            "playable": clear["playable"],
+            "total": clear["total"],
+            "revenge": len(lists["revenge"]),
+            "unplayed": len(lists["unplayed"]),
+        },
+        "workout": {
+            "today": today.isoformat(),
+            "last_day": stats.days[-1].item().isoformat() if len(stats) else None,
+            "recent": {f"{window}d": _recent(stats, window, today) for window in RECENT_WINDOWS},
+            "total_kcal": round(float(totals["total_kcal"]), 1),
+            "total_songs": totals["total_songs"],
+        },
+    }
+
+
+class StatsCache:
+    """(プレイヤー, レベル) ごとに作ったJSONとETag。DBか日付が変わったときだけ作り直す"""
+
+    def __init__(self):
+        self.watcher = ChangeWatcher()
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, level, player):
+        """(本文のバイト列, ETag)"""
+        key = (player, level)
+        version = (self.watcher.version(datastore.DB_FILE, players.db_path(player)), date.today())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1], entry[2]
+        data = build_stats(level, player)
+        # 作り直しても数値が同じなら同じETag（作成日時はETagに含めない）
+        etag = '"' + hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest() + '"'
+        data["generated_at"] = datetime.now().isoformat(timespec="seconds")
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            self._entries[key] = (version, body, etag)
+        return body, etag
+
+
+class StatsHandler(BaseHTTPRequestHandler):
+    cache = None   # make_server() で StatsCache を入れる
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/stats":
+            self._send_json(404, {"error": f"見つかりません: {url.path}"})
+            return
+        query = parse_qs(url.query)
+        try:
+            level = int(query.get("level", [lv.DEFAULT_LEVEL])[0])
+            if level not in lv.ALL_LEVELS:
+                raise ValueError(f"不明なレベルです: {level}")
+            player = players.normalize_player(query.get("player", [None])[0])
+            if player not in players.list_players():
+                raise ValueError(f"登録されていないプレイヤーです: {player}")
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            body, etag = self.cache.get(level, player)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        if etag in (tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self._send_common_headers()
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self._send_common_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_OPTIONS(self):
+        # オーバーレイが If-None-Match を付けると、別オリジンのブラウザは先にこの確認（プリフライト）を送る
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Methods", "GET")
+        self.send_header("Access-Control-Allow-Headers", "If-None-Match")
+        self.send_header("Access-Control-Max-Age", "86400")
+        self._send_common_headers()
+        self.end_headers()
+
+    def _send_common_headers(self):
+        # 毎回ETagで確かめてもらう。ブラウザのオーバーレイ（別オリジン）からも読めるようにする
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Expose-Headers", "ETag")
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self._send_common_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_request(self, code="-", size="-"):
+        # 毎秒のポーリングでログが埋まらないよう、成功したリクエストは記録しない（エラーは出る）
+        pass
+
+
+def make_server(host=HOST, port=PORT):
+    handler = type("Handler", (StatsHandler,), {"cache": StatsCache()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="クリア率・ワークアウトの集計をJSONで返す読み取り専用サーバー")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port)
+    print(f"http://{args.host}:{args.port}/stats?level={lv.DEFAULT_LEVEL} で待ち受けています (Ctrl+C で終了)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crawl_checkpoint
+import html_parser
+import scrape_official_ddr as so
+
+# fetch_score_pages をローカルのHTTPサーバー相手に動かす（ブラウザもログインも使わない）
+# 使い方: python -m pytest tests / python -m unittest discover tests
+
+
+def score_page(offset, count=3):
+    """スコア表に count 行あるページ（count=0 なら一覧の終わり）"""
+    rows = "".join(
+        f'<tr class="data"><td><div class="music_tit">Song {offset}-{i}</div></td>'
+        f'<td id="expert"><img src="/img/rank_s_a.png"><span class="data_score">{900000 + i}</span></td>'
+        f'<td id="challenge"></td></tr>'
+        for i in range(count)
+    )
+    return f'<html><body><table id="{html_parser.SCORE_TABLE_ID}">{rows}</table></body></html>'
+
+
+LOGIN_PAGE = "<html><body><form id=\"login\">KONAMI ID</form></body></html>"
+
+
+class FixtureServer:
+    """offset ごとのページを返すサーバー。fail に入れた offset は、残り回数だけ 500 を返す"""
+
+    def __init__(self, pages):
+        self.pages = pages       # {offset: HTML}。無い offset は一覧の終わり
+        self.fail = {}           # {offset: 500を返す残り回数}
+        self.requests = []       # 届いた offset の順
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                offset = int(parse_qs(urlparse(self.path).query)["offset"][0])
+                with server._lock:
+                    server.requests.append(offset)
+                    failing = server.fail.get(offset, 0)
+                    if failing:
+                        server.fail[offset] = failing - 1
+                if failing:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                body = server.pages.get(offset, score_page(offset, 0)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url_template = f"http://127.0.0.1:{self.httpd.server_port}/scores?offset={{offset}}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FetchScorePagesTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FixtureServer({offset: score_page(offset) for offset in range(5)})
+        self.session = requests.Session()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.session.close()
+        self.server.close()
+        self.tmp.cleanup()
+
+    def fetch(self, **kwargs):
+        kwargs.setdefault("max_workers", 3)
+        return so.fetch_score_pages(self.session, self.server.url_template, interval=0, **kwargs)
+
+    def checkpoint(self):
+        return crawl_checkpoint.CrawlCheckpoint(os.path.join(self.tmp.name, "lv18"))
+
+    def test_stops_at_empty_score_table(self):
+        pages = self.fetch()
+        self.assertEqual(len(pages), 5)
+        self.assertEqual([rows[0][0] for rows in pages], [f"Song {offset}-0" for offset in range(5)])
+        self.assertEqual(pages[0][0][3], 900000)
+
+    def test_repeated_last_page_is_dropped(self):
+        # 範囲外の offset で最終ページが繰り返されるサイト
+        self.server.pages.update({offset: score_page(4) for offset in range(5, 8)})
+        self.assertEqual(len(self.fetch()), 5)
+
+    def test_failed_page_raises_crawl_incomplete(self):
+        self.server.fail[2] = 10
+        with self.assertRaises(so.CrawlIncomplete) as ctx:
+            self.fetch()
+        self.assertIn("Page 3", str(ctx.exception))
+
+    def test_login_page_midway_is_not_end_of_list(self):
+        self.server.pages[3] = LOGIN_PAGE
+        with self.assertRaises(so.CrawlIncomplete) as ctx:
+            self.fetch()
+        self.assertIn("Page 4", str(ctx.exception))
+
+    def test_login_page_first_returns_nothing(self):
+        # ログインが引き継げていない（呼び出し側がブラウザで巡回し直す）
+        self.server.pages = {offset: LOGIN_PAGE for offset in range(10)}
+        self.assertEqual(self.fetch(), [])
+
+    def test_resume_from_checkpoint_fetches_only_missing_pages(self):
+        self.server.fail[2] = 1
+        with self.assertRaises(so.CrawlIncomplete):
+            self.fetch(checkpoint=self.checkpoint())
+
+        self.server.requests.clear()
+        checkpoint = self.checkpoint()
+        self.assertNotIn(2, checkpoint)
+        pages = self.fetch(checkpoint=checkpoint)
+        self.assertEqual(len(pages), 5)
+        self.assertIn(2, self.server.requests)
+        self.assertFalse({0, 1, 3, 4} & set(self.server.requests))
+
+    def test_not_score_page_is_not_checkpointed(self):
+        self.server.pages[3] = LOGIN_PAGE
+        with self.assertRaises(so.CrawlIncomplete):
+            self.fetch(checkpoint=self.checkpoint())
+        self.assertNotIn(3, self.checkpoint())
+
+
+if __name__ == "__main__":
+    unittest.main()
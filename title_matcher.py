@@ -0,0 +1,69 @@
+from collections import defaultdict
+
+import numpy as np
+
+from title_normalize import fuzzy_key
+
+# ==========================================
+# 設定エリア
+# ==========================================
+NGRAM = 3                # 3文字ずつに区切って索引を作る
+MIN_CONFIDENCE = 0.6     # これ以上の一致度なら同じ曲とみなす
+MIN_SUGGESTION = 0.4     # 採用はしないが、手動対応付けの候補として報告する下限
+MIN_MARGIN = 0.05        # 2番目の候補とこれ以上差が無ければ採用しない（取り違え防止）
+# ==========================================
+
+
+def ngrams(key, n=NGRAM):
+    # 前後を空白で埋めるので、1〜2文字の曲名（「び」「冥」など）も比較できる
+    padded = " " * (n - 1) + key + " " * (n - 1)
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class TitleMatcher:
+    """公式の曲名リストに対する n-gram 転置索引。
+
+    問い合わせの n-gram の posting をつなげて bincount するだけで、全候補との共有数が一度に出る。
+    一致度は n-gram 集合の Dice 係数 (0〜1)。曲名どうしの総当たり比較はしない。
+    """
+
+    def __init__(self, titles, n=NGRAM):
+        self.n = n
+        self.titles = list(dict.fromkeys(str(t) for t in titles))
+        index = defaultdict(list)
+        sizes = []
+        for i, title in enumerate(self.titles):
+            grams = ngrams(fuzzy_key(title), n)
+            sizes.append(len(grams))
+            for gram in grams:
+                index[gram].append(i)
+        self._index = {gram: np.array(ids, dtype=np.int32) for gram, ids in index.items()}
+        self._sizes = np.array(sizes, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def candidates(self, title, limit=3, min_score=MIN_SUGGESTION):
+        """[(公式の曲名, 一致度), ...] を一致度の高い順に返す（min_score 未満は除く）"""
+        grams = ngrams(fuzzy_key(title), self.n)
+        postings = [self._index[g] for g in grams if g in self._index]
+        if not postings:
+            return []
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.titles))
+        hit = np.flatnonzero(shared)
+        scores = 2 * shared[hit] / (len(grams) + self._sizes[hit])
+        keep = scores >= min_score
+        hit, scores = hit[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [(self.titles[hit[k]], float(scores[k])) for k in order]
+
+    def match(self, title, min_confidence=MIN_CONFIDENCE, min_margin=MIN_MARGIN):
+        """(公式の曲名 or None, 一致度)。一致度が低いか、僅差の候補がある場合は None"""
+        found = self.candidates(title, limit=2, min_score=min(min_confidence, MIN_SUGGESTION))
+        if not found:
+            return None, 0.0
+        best, confidence = found[0]
+        runner_up = found[1][1] if len(found) > 1 else 0.0
+        if confidence < min_confidence or confidence - runner_up < min_margin:
+            return None, confidence
+        return best, confidence
@@ -0,0 +1,92 @@
+import re
+import unicodedata
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    HAS_PYARROW = True
+except ImportError:  # pyarrow が無ければ1件ずつ正規化する
+    HAS_PYARROW = False
+
+# ==========================================
+# 曲名の正規化（照合用の指紋・あいまい照合用のキー）
+# ==========================================
+# 指紋の作り方を変えたら上げる（datastore に保存済みの指紋を作り直す合図）
+FINGERPRINT_VERSION = 1
+
+# 難易度表記 (鬼)(激) などは曲名ではないので末尾だけ消す
+# ※ (X-Special) や (2025 edit) みたいな曲名の一部は残したい
+DIFFICULTY_SUFFIX = r'\((鬼|激|踊|楽|習)\)$'
+# 英数字と日本語（ひらがな・カタカナ・漢字）以外は全て消す（記号 ~, -, ", space など）
+# ※ raw文字列にしないのは、pandas(pyarrow) の正規表現エンジンが \uXXXX を解釈しないため（実際の文字にしておく）
+NON_FINGERPRINT_CHARS = '[^a-zA-Z0-9\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]+'
+
+_DIFFICULTY_SUFFIX_RE = re.compile(DIFFICULTY_SUFFIX)
+_NON_FINGERPRINT_RE = re.compile(NON_FINGERPRINT_CHARS)
+
+# プロセス内のキャッシュ（曲名 -> 指紋）。datastore がディスク上のキャッシュから補充する
+_memory_cache = {}
+
+
+def create_fingerprint(text):
+    """1曲分の指紋（fingerprints と同じ結果）"""
+    if pd.isna(text): return ""
+    # 1. NFKC正規化（全角英数を半角になど）
+    text = unicodedata.normalize('NFKC', str(text))
+    # 2. 難易度表記 (鬼)(激) などを先に削除
+    text = _DIFFICULTY_SUFFIX_RE.sub('', text)
+    # 3. 英数字と日本語以外を全て削除
+    text = _NON_FINGERPRINT_RE.sub('', text)
+    # 4. 大文字小文字も無視（全て小文字へ）
+    return text.lower()
+
+
+def _fingerprint_batch(titles):
+    # まとめて正規化する。記号の削除と小文字化は pyarrow なら列全体に対する1回のカーネル呼び出しで済む
+    # ※ NFKC は unicodedata で行う（pyarrow の utf8_normalize は濁点などを合成しないことがあり、指紋が変わる）。
+    #   ASCIIだけの曲名はNFKCで変わらないので飛ばす
+    normalize = unicodedata.normalize
+    texts = [t if t.isascii() else normalize('NFKC', t) for t in titles]
+    if not HAS_PYARROW:
+        texts = [_NON_FINGERPRINT_RE.sub('', _DIFFICULTY_SUFFIX_RE.sub('', t)) for t in texts]
+        return [t.lower() for t in texts]
+    arr = pa.array(texts, type=pa.string())
+    arr = pc.replace_substring_regex(arr, DIFFICULTY_SUFFIX, "")
+    arr = pc.replace_substring_regex(arr, NON_FINGERPRINT_CHARS, "")
+    return pc.utf8_lower(arr).to_pylist()
+
+
+def _as_text(value):
+    if isinstance(value, str):
+        return value
+    return "" if pd.isna(value) else str(value)
+
+
+def fingerprints(titles, cache=None, on_new=None):
+    """曲名の並びを指紋の Series にする（キャッシュに無い曲名だけを正規化）。
+    titles が Series なら index を引き継ぐ。cache を渡すとそのdictに結果を追加する（省略時はプロセス内キャッシュ）。
+    on_new には新しく正規化した [(曲名, 指紋), ...] が渡される（ディスク上のキャッシュへの追記用）"""
+    cache = _memory_cache if cache is None else cache
+    texts = [_as_text(v) for v in titles]
+    missing = [t for t in dict.fromkeys(texts) if t not in cache]
+    if missing:
+        pairs = list(zip(missing, _fingerprint_batch(missing)))
+        cache.update(pairs)
+        if on_new is not None:
+            on_new(pairs)
+    index = titles.index if isinstance(titles, pd.Series) else None
+    return pd.Series([cache[t] for t in texts], index=index, dtype=object)
+
+
+def remember(pairs):
+    """ディスク上のキャッシュなどから読んだ (曲名, 指紋) をプロセス内キャッシュに入れる"""
+    _memory_cache.update(pairs)
+
+
+def fuzzy_key(text):
+    """あいまい照合用のキー。指紋と違い、ギリシャ文字やアクセント付き文字も残す"""
+    text = unicodedata.normalize('NFKC', str(text)).strip()
+    text = _DIFFICULTY_SUFFIX_RE.sub('', text).lower()
+    return "".join(ch for ch in text if ch.isalnum())
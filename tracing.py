@@ -0,0 +1,260 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# ==========================================
+# 工程ごとの処理時間の記録（JSONL）
+# ==========================================
+# 使い方:
+#   with tracing.run("official", levels=[18]):      # 1回の実行（終わったら TRACE_FILE に追記）
+#       with tracing.span("login"):                 # 工程。入れ子にでき、実行中でなければ何もしない
+#           ...
+#   pool.submit(tracing.wrap(fetch), offset)        # 別スレッドの処理も同じ実行に記録する
+base_dir = os.path.dirname(os.path.abspath(__file__))
+TRACE_DIR = os.path.join(base_dir, ".traces")
+TRACE_FILE = os.path.join(TRACE_DIR, "trace.jsonl")
+MAX_TRACE_BYTES = 5 * 1024 * 1024   # これを超えたら trace.jsonl.1 に退避して書き直す
+# ==========================================
+
+_current_run = contextvars.ContextVar("tracing_run", default=None)
+_current_span = contextvars.ContextVar("tracing_span", default=None)
+_write_lock = threading.Lock()
+
+
+class Run:
+    """1回の実行で記録された工程の一覧"""
+
+    def __init__(self, name, attrs):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attrs = attrs
+        self.started = time.time()
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = []
+
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def offset(self):
+        return time.perf_counter() - self._origin
+
+
+@contextmanager
+def span(name, **attrs):
+    run_ = _current_run.get()
+    if run_ is None:
+        yield
+        return
+
+    parent = _current_span.get()
+    token = _current_span.set(name)
+    start = run_.offset()
+    error = None
+    try:
+        yield
+    except BaseException as exc:
+        error = type(exc).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        record = {
+            "name": name,
+            "parent": parent,
+            "start": round(start, 6),
+            "duration": round(run_.offset() - start, 6),
+            "thread": threading.current_thread().name,
+        }
+        if attrs:
+            record["attrs"] = attrs
+        if error:
+            record["error"] = error
+        run_.add(record)
+
+
+def start_run(name, **attrs):
+    """実行を開始する（with を使えない場所用。finish_run で終える）"""
+    run_ = Run(name, attrs)
+    _current_run.set(run_)
+    _current_span.set(name)
+    return run_
+
+
+def finish_run(run_, error=None):
+    """実行を終えて TRACE_FILE に書き出す"""
+    duration = run_.offset()
+    if _current_run.get() is run_:
+        _current_run.set(None)
+        _current_span.set(None)
+    root = {"name": run_.name, "parent": None, "start": 0.0, "duration": round(duration, 6),
+            "thread": threading.current_thread().name}
+    if run_.attrs:
+        root["attrs"] = run_.attrs
+    if error:
+        root["error"] = error
+    _write(run_, [root, *sorted(run_.spans, key=lambda r: r["start"])])
+    return duration
+
+
+@contextmanager
+def run(name, **attrs):
+    """1回の実行。すでに実行中なら、その中の工程として記録する"""
+    if _current_run.get() is not None:
+        with span(name, **attrs):
+            yield
+        return
+
+    run_ = Run(name, attrs)
+    run_token = _current_run.set(run_)
+    span_token = _current_span.set(name)
+    error = None
+    try:
+        yield run_
+    except BaseException as exc:
+        error = type(exc).__name__
+        raise
+    finally:
+        _current_span.reset(span_token)
+        _current_run.reset(run_token)
+        finish_run(run_, error)
+
+
+def wrap(func):
+    """今の実行・工程を引き継いで func を呼ぶ関数を返す（ThreadPoolExecutor に渡す用）"""
+    run_, parent = _current_run.get(), _current_span.get()
+    if run_ is None:
+        return func
+
+    def wrapped(*args, **kwargs):
+        run_token = _current_run.set(run_)
+        span_token = _current_span.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_span.reset(span_token)
+            _current_run.reset(run_token)
+    return wrapped
+
+
+# --- 書き出し・読み込み ---
+def _write(run_, records, path=None):
+    path = path or TRACE_FILE
+    lines = "".join(
+        json.dumps({"run": run_.id, "run_name": run_.name, "time": run_.started, **r}, ensure_ascii=False) + "\n"
+        for r in records
+    )
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > MAX_TRACE_BYTES:
+                os.replace(path, path + ".1")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(lines)
+    except OSError:
+        # 記録に失敗しても本来の処理は止めない
+        pass
+
+
+def load_runs(name=None, limit=1, path=None):
+    """新しい順に最大 limit 回分の実行を [{"id", "name", "time", "spans": [...]}, ...] で返す"""
+    path = path or TRACE_FILE
+    if not os.path.exists(path):
+        return []
+    runs = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if name is not None and record.get("run_name") != name:
+                continue
+            entry = runs.setdefault(record["run"], {
+                "id": record["run"], "name": record["run_name"], "time": record["time"], "spans": [],
+            })
+            entry["spans"].append(record)
+    ordered = sorted(runs.values(), key=lambda r: r["time"], reverse=True)
+    return ordered[:limit]
+
+
+class _LatestRuns:
+    """TRACE_FILE を前回読んだ位置から読み足し、実行の名前ごとに最新の1回だけを覚える。
+    画面表示のたびに記録が書き足されても、読むのは増えた行だけ"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file_id = None
+        self._offset = 0
+        self._runs = {}   # 実行の名前 -> {"id", "name", "time", "spans"}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            self._read_new_lines()
+            return self._runs.get(name)
+
+    def _read_new_lines(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self._file_id or stat.st_size < self._offset:
+            # trace.jsonl.1 に退避されて新しいファイルになった（覚えている実行はそのまま使う）
+            self._file_id, self._offset = file_id, 0
+        if stat.st_size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1   # 書きかけの行は次回に読む
+        self._offset += end
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            entry = self._runs.get(record["run_name"])
+            if entry is None or (entry["id"] != record["run"] and record["time"] >= entry["time"]):
+                entry = self._runs[record["run_name"]] = {
+                    "id": record["run"], "name": record["run_name"], "time": record["time"], "spans": [],
+                }
+            if entry["id"] == record["run"]:
+                entry["spans"].append(record)
+
+
+_latest = {}
+_latest_lock = threading.Lock()
+
+
+def latest_run(name, path=None):
+    """名前が name の最新の実行（load_runs(name)[0] と同じ形）。無ければ None。
+    ファイルは前回読んだところから読み足すだけなので、毎回呼んでも軽い"""
+    path = path or TRACE_FILE
+    with _latest_lock:
+        reader = _latest.get(path)
+        if reader is None:
+            reader = _latest[path] = _LatestRuns(path)
+    return reader.get(name)
+
+
+def breakdown(run_):
+    """工程名ごとの合計時間・回数（長い順）。並列の工程は重なるので合計が全体を超えることがある"""
+    spans = run_["spans"]
+    total = next((s["duration"] for s in spans if s["parent"] is None), 0.0)
+    summary = {}
+    for s in spans:
+        if s["parent"] is None:
+            continue
+        entry = summary.setdefault(s["name"], {"name": s["name"], "seconds": 0.0, "count": 0})
+        entry["seconds"] += s["duration"]
+        entry["count"] += 1
+    rows = sorted(summary.values(), key=lambda e: -e["seconds"])
+    for entry in rows:
+        entry["share"] = entry["seconds"] / total if total else 0.0
+    return total, rows
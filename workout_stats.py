@@ -0,0 +1,218 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# ワークアウト（1日1行: 日付, 曲数, 消費カロリー）の集計。
+# 日付順の累積和だけを持ち、直近7日/30日・週/月ごとの合計・回帰直線はすべて累積和の差から出す。
+# 新しい日が増えたときは累積和を後ろに足すだけ。過去の日が書き換わったときは、その日以降だけ作り直す。
+# 状態（日付・曲数・カロリー・累積和）は1つのタプルで丸ごと差し替えるので、
+# 他のスレッドが update() している最中に読んでも、新旧の配列が混ざることはない
+
+# ==========================================
+# 設定エリア
+# ==========================================
+ROLLING_WINDOWS = (7, 30)   # 直近の集計期間（日）。記録の無い日は0として数える
+MAX_CHART_POINTS = 180      # グラフに渡す点の数の上限（画面幅で棒や点が潰れない程度）
+# ==========================================
+
+# 累積和の列
+_KCAL, _SONGS, _XY, _XX, _YY = range(5)
+
+
+def _as_arrays(df_calories):
+    """(日付の配列 datetime64[D], 曲数, 消費カロリー)。日付順、同じ日は後の行を使う"""
+    df = df_calories[["日付", "曲数", "消費カロリー"]].copy()
+    df["日付"] = pd.to_datetime(df["日付"]).dt.normalize()
+    df = df.dropna().drop_duplicates("日付", keep="last").sort_values("日付")
+    return (
+        df["日付"].to_numpy().astype("datetime64[D]"),
+        df["曲数"].to_numpy(dtype=float),
+        df["消費カロリー"].to_numpy(dtype=float),
+    )
+
+
+def _cumulative(songs, kcal, start=None):
+    values = np.column_stack([kcal, songs, songs * kcal, songs * songs, kcal * kcal])
+    cum = np.cumsum(values, axis=0)
+    if start is not None:
+        cum += start
+    return cum
+
+
+class WorkoutStats:
+    """ワークアウトの集計。update() で新しいデータを渡すと、変わった日以降だけ計算し直す"""
+
+    def __init__(self, df_calories=None):
+        # (日付, 曲数, 消費カロリー, 累積和)。累積和の先頭は0行（i日目までの合計 = cum[i + 1]）
+        self._state = (
+            np.array([], dtype="datetime64[D]"), np.array([], dtype=float), np.array([], dtype=float), np.zeros((1, 5))
+        )
+        self._lock = threading.Lock()   # update() どうしの排他（読むだけなら不要）
+        self.recomputed = 0             # 直近の update() で計算し直した日数
+        if df_calories is not None:
+            self.update(df_calories)
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def days(self):
+        return self._state[0]
+
+    @property
+    def songs(self):
+        return self._state[1]
+
+    @property
+    def kcal(self):
+        return self._state[2]
+
+    def frozen(self, state=None):
+        """今の状態で固定した読み取り用のコピー（配列は共有するので軽い）。
+        いくつかの集計を同じ版のデータから出したいときに使う"""
+        view = WorkoutStats()
+        view._state = state or self._state
+        return view
+
+    def update(self, df_calories):
+        """全期間のデータを渡す。前回と同じ日は計算し直さない。計算し直した日数を返す"""
+        self._apply(df_calories)
+        return self.recomputed
+
+    def updated(self, df_calories):
+        """update() して、渡したデータの集計で固定したコピーを返す（直後に他のスレッドが更新しても変わらない）"""
+        return self.frozen(self._apply(df_calories))
+
+    def _apply(self, df_calories):
+        days, songs, kcal = _as_arrays(df_calories)
+        with self._lock:
+            old_days, old_songs, old_kcal, old_cum = self._state
+            # 前回と一致する先頭部分はそのまま使う
+            n = min(len(days), len(old_days))
+            same = (days[:n] == old_days[:n]) & (songs[:n] == old_songs[:n]) & (kcal[:n] == old_kcal[:n])
+            keep = n if same.all() else int(np.argmin(same))
+
+            cum = np.vstack([old_cum[:keep + 1], _cumulative(songs[keep:], kcal[keep:], old_cum[keep])])
+            self._state = (days, songs, kcal, cum)
+            self.recomputed = len(days) - keep
+            return self._state
+
+    # --- 合計 ---
+    def totals(self):
+        days, _, _, cum = self._state
+        n = len(days)
+        total = cum[-1]
+        return {
+            "days": n,
+            "total_kcal": total[_KCAL],
+            "total_songs": int(total[_SONGS]),
+            "avg_kcal": total[_KCAL] / n if n else 0.0,
+        }
+
+    def rolling(self, window):
+        """各記録日までの直近 window 日（暦日）の合計と1日平均"""
+        days, _, _, cum = self._state
+        start = np.searchsorted(days, days - (window - 1), side="left")
+        stop = np.arange(1, len(days) + 1)
+        sums = cum[stop] - cum[start]
+        return pd.DataFrame({
+            "日付": days.astype("datetime64[ns]"),
+            f"{window}日合計": sums[:, _KCAL],
+            f"{window}日平均": sums[:, _KCAL] / window,
+            f"{window}日曲数": sums[:, _SONGS].astype(int),
+        })
+
+    def recent(self, window, today=None):
+        """今日（省略時は最後の記録日）までの直近 window 日の合計 {"kcal", "songs", "days"}"""
+        days, _, _, cum = self._state
+        if not len(days):
+            return {"kcal": 0.0, "songs": 0, "days": 0}
+        end = np.datetime64(today, "D") if today is not None else days[-1]
+        start = np.searchsorted(days, end - (window - 1), side="left")
+        stop = np.searchsorted(days, end, side="right")
+        sums = cum[stop] - cum[start]
+        return {"kcal": sums[_KCAL], "songs": int(sums[_SONGS]), "days": int(stop - start)}
+
+    def rollup(self, freq):
+        """週ごと（"W"、月曜始まり）・月ごと（"M"）の合計"""
+        days, _, _, cum = self._state
+        if freq == "W":
+            # 1970-01-01 は木曜なので、+3 して7で割った余りが曜日（月曜=0）
+            offset = (days.astype(np.int64) + 3) % 7
+            periods = days - offset.astype("timedelta64[D]")
+        elif freq == "M":
+            periods = days.astype("datetime64[M]").astype("datetime64[D]")
+        else:
+            raise ValueError(f"不明な集計単位です: {freq}")
+
+        if not len(periods):
+            return pd.DataFrame(columns=["期間", "日数", "曲数", "消費カロリー"])
+        bounds = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+        stops = np.r_[bounds[1:], len(periods)]
+        sums = cum[stops] - cum[bounds]
+        return pd.DataFrame({
+            "期間": periods[bounds].astype("datetime64[ns]"),
+            "日数": stops - bounds,
+            "曲数": sums[:, _SONGS].astype(int),
+            "消費カロリー": sums[:, _KCAL],
+        })
+
+    def regression(self):
+        """消費カロリー = slope * 曲数 + intercept の最小二乗（r2 は決定係数）。2日未満なら None"""
+        days, _, _, cum = self._state
+        n = len(days)
+        sy, sx, sxy, sxx, syy = cum[-1]
+        denom = n * sxx - sx * sx
+        if n < 2 or denom == 0:
+            return None
+        slope = (n * sxy - sx * sy) / denom
+        intercept = (sy - slope * sx) / n
+        ss_tot = syy - sy * sy / n
+        ss_res = syy - intercept * sy - slope * sxy
+        return {"slope": slope, "intercept": intercept, "r2": 1 - ss_res / ss_tot if ss_tot else 1.0}
+
+    # --- グラフ用 ---
+    def daily(self):
+        """日ごとの表（燃焼効率つき）"""
+        days, songs, kcal, _ = self._state
+        with np.errstate(divide="ignore", invalid="ignore"):
+            efficiency = np.where(songs > 0, kcal / songs, np.nan)
+        return pd.DataFrame({
+            "日付": days.astype("datetime64[ns]"),
+            "曲数": songs.astype(int),
+            "消費カロリー": kcal,
+            "燃焼効率": efficiency,
+        })
+
+    def chart_series(self, max_points=MAX_CHART_POINTS):
+        """日々の推移グラフ用。点が多いときは同じ日数ずつまとめて合計する（日付はまとめた期間の初日）"""
+        view = self.frozen()
+        days, _, _, cum = view._state
+        if len(days) <= max_points:
+            return view.daily()
+        span = int((days[-1] - days[0]).astype(int)) + 1
+        bucket = -(-span // max_points)   # 切り上げ
+        index = ((days - days[0]).astype(int) // bucket)
+        bounds = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+        stops = np.r_[bounds[1:], len(index)]
+        sums = cum[stops] - cum[bounds]
+        return pd.DataFrame({
+            "日付": (days[0] + (index[bounds] * bucket).astype("timedelta64[D]")).astype("datetime64[ns]"),
+            "曲数": sums[:, _SONGS].astype(int),
+            "消費カロリー": sums[:, _KCAL],
+            "燃焼効率": sums[:, _KCAL] / np.where(sums[:, _SONGS] > 0, sums[:, _SONGS], np.nan),
+        })
+
+    def scatter_points(self, max_points=MAX_CHART_POINTS):
+        """プレイ分析（曲数と消費カロリー）用。点が多いときは直近 max_points 日だけ（回帰直線は全期間）"""
+        return self.daily().tail(max_points)
+
+    def regression_line(self):
+        """回帰直線の両端2点（曲数の最小・最大）。直線が引けなければ空"""
+        view = self.frozen()
+        fit = view.regression()
+        if fit is None:
+            return pd.DataFrame(columns=["曲数", "消費カロリー"])
+        x = np.array([view.songs.min(), view.songs.max()])
+        return pd.DataFrame({"曲数": x, "消費カロリー": fit["slope"] * x + fit["intercept"]})